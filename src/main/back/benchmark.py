@@ -0,0 +1,357 @@
+"""
+Benchmarks of the solvers, run with `python benchmark.py [name ...]` from this directory (all of them by default).
+Boards are built from a fixed seed so that runs can be compared.
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from futoshiki import Futoshiki
+from futoshiki_generator import get_generator
+from hashiwokakero import CONNECTIVITY as HASHIWOKAKERO_CONNECTIVITY, Hashiwokakero
+from hashiwokakero_generator import HashiwokakeroGenerator
+from numberlink import FORMULATIONS as NUMBERLINK_FORMULATIONS, Numberlink
+from numberlink_generator import NumberlinkGenerator
+from numberlink_router import NumberlinkRouter
+from nurikabe import STRATEGIES as NURIKABE_STRATEGIES, Nurikabe
+from nurikabe_generator import NurikabeGenerator
+from shikaku import Shikaku
+from shikaku_generator import ShikakuGenerator
+from sudoku import Sudoku
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def domain_size(model):
+    # Total number of values left in the domains of the model's variables
+    total = 0
+    for variable in model.Proto().variables:
+        bounds = variable.domain
+        total += sum(bounds[i + 1] - bounds[i] + 1 for i in range(0, len(bounds), 2))
+    return total
+
+
+def solved_sudoku(box, rng):
+    # A full grid from the usual shifted pattern, shuffled by relabelling the digits and permuting bands and stacks
+    n = box * box
+    bands = rng.sample(range(box), box)
+    rows = [b * box + r for b in bands for r in rng.sample(range(box), box)]
+    stacks = rng.sample(range(box), box)
+    cols = [s * box + c for s in stacks for c in rng.sample(range(box), box)]
+    digits = rng.sample(range(1, n + 1), n)
+    return [[digits[(box * (r % box) + r // box + c) % n] for c in cols] for r in rows]
+
+
+def benchmark_sudoku(rng):
+    # Model size and CP-SAT solve time with and without pre-solve domain reduction, and the default solve() path
+    print(f'{"size":>7} {"reduced":>8} {"domains":>8} {"build (s)":>10} {"cp-sat (s)":>11} {"solve (s)":>11}')
+    for box in (3, 4, 5):
+        n = box * box
+        rows = solved_sudoku(box, rng)
+        for r, c in rng.sample([(r, c) for r in range(n) for c in range(n)], n * n * 6 // 10):
+            rows[r][c] = 0
+        for propagate in (False, True):
+            sudoku, build = timed(Sudoku, rows, propagate)
+            domains = domain_size(sudoku.model)
+            _, cp_sat = timed(sudoku.solve, native=False)
+            _, native = timed(Sudoku(rows).solve)
+            print(f'{n:>3}x{n:<3} {str(propagate):>8} {domains:>8} {build:>10.4f} {cp_sat:>11.4f} {native:>11.4f}')
+
+
+def latin_square(n, rng):
+    # A random Latin square: the cyclic one with its rows, columns and symbols shuffled
+    rows = rng.sample(range(n), n)
+    cols = rng.sample(range(n), n)
+    symbols = rng.sample(range(1, n + 1), n)
+    return [[symbols[(r + c) % n] for c in cols] for r in rows]
+
+
+def random_futoshiki(n, rng, density):
+    # Inequalities between a fraction density of the adjacent pairs of a random Latin square, no givens
+    square = [x for row in latin_square(n, rng) for x in row]
+    ineqs = []
+    for i in range(n * n):
+        for j in (i + 1, i + n):
+            if (j == i + 1 and j % n == 0) or j >= n * n or rng.random() >= density:
+                continue
+            ineqs.append(['<' if square[i] < square[j] else '>', i, j])
+    return [[0] * n for _ in range(n)], ineqs
+
+
+def benchmark_futoshiki(rng):
+    # CP-SAT solve time with and without the inequality-chain domain tightening
+    print(f'{"size":>7} {"density":>8} {"tightened":>10} {"domains":>8} {"solve (s)":>10}')
+    for n in (7, 9):
+        for density in (0.4, 0.7):
+            rows, ineqs = random_futoshiki(n, rng, density)
+            for tighten in (False, True):
+                futoshiki = Futoshiki(rows, ineqs, tighten)
+                domains = domain_size(futoshiki.model)
+                _, solve = timed(futoshiki.solve)
+                print(f'{n:>3}x{n:<3} {density:>8} {str(tighten):>10} {domains:>8} {solve:>10.4f}')
+
+
+def benchmark_futoshiki_generator(rng):
+    # Time per uniquely solvable puzzle and clues used, the model being built once per size
+    print(f'{"size":>7} {"build (s)":>10} {"puzzle (s)":>11} {"ineqs":>6} {"givens":>7}')
+    for n in (5, 7, 9):
+        generator, build = timed(get_generator, n)
+        count = 10
+        total, ineqs, givens = 0, 0, 0
+        for _ in range(count):
+            (rows, puzzle_ineqs), elapsed = timed(generator.puzzle, rng.random())
+            total += elapsed
+            ineqs += len(puzzle_ineqs)
+            givens += sum(x != 0 for row in rows for x in row)
+        print(f'{n:>3}x{n:<3} {build:>10.4f} {total / count:>11.4f} {ineqs / count:>6.1f} {givens / count:>7.1f}')
+
+
+def random_shikaku(n, rng, max_area):
+    # Clue grid of a random partition of the board into rectangles of area at most max_area,
+    # by splitting the biggest rectangles at random, one clue at a random cell of each
+    rows = [[0] * n for _ in range(n)]
+    pending = [(0, 0, n, n)]
+    while pending:
+        top, left, height, width = pending.pop()
+        if height * width <= max_area and (height * width == 1 or rng.random() < 0.5):
+            r, c = top + rng.randrange(height), left + rng.randrange(width)
+            rows[r][c] = height * width
+        elif height >= width:
+            cut = rng.randrange(1, height)
+            pending += [(top, left, cut, width), (top + cut, left, height - cut, width)]
+        else:
+            cut = rng.randrange(1, width)
+            pending += [(top, left, height, cut), (top, left + cut, height, width - cut)]
+    return rows
+
+
+def build_shikaku(rows, method):
+    # Everything done before the search: the constructor, then the constraints or the placements
+    shikaku = Shikaku(rows, method)
+    if method == 'bounds':
+        shikaku.constraints()
+    else:
+        shikaku.cover_rows(shikaku.placements())
+
+
+def benchmark_shikaku(rng):
+    # Build time, peak memory of the build (traced on a second build) and solve time of both formulations,
+    # with the rectangles fixed by forced placements and the independent regions left for the placements.
+    # The bounds model is left out past 16x16, where it takes minutes
+    print(f'{"size":>7} {"clues":>6} {"method":>11} {"build (s)":>10} {"memory (MB)":>12} {"solve (s)":>10} '
+          f'{"fixed":>6} {"regions":>8}')
+    for n in (8, 12, 16, 20, 30, 50):
+        rows = random_shikaku(n, rng, 12)
+        clues = sum(x != 0 for row in rows for x in row)
+        for method in ('placements', 'bounds'):
+            if method == 'bounds' and n > 16:
+                continue
+            _, build = timed(build_shikaku, rows, method)
+            tracemalloc.start()
+            build_shikaku(rows, method)
+            memory = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+            shikaku = Shikaku(rows, method)
+            _, solve = timed(shikaku.solve)
+            fixed, regions = '-', '-'
+            if method == 'placements':
+                placements = shikaku.placements()
+                forced = shikaku.propagate(placements)
+                fixed, regions = len(forced), len(shikaku.regions(placements, forced))
+            print(f'{n:>3}x{n:<3} {clues:>6} {method:>11} {build:>10.4f} {memory:>12.2f} {solve:>10.4f} '
+                  f'{fixed:>6} {regions:>8}')
+
+
+def benchmark_shikaku_generator(rng):
+    # Uniquely solvable puzzles generated per second
+    print(f'{"size":>7} {"puzzles/s":>10} {"clues":>6}')
+    for n in (10, 15, 20):
+        generator = ShikakuGenerator(n, rng.random())
+        count = 20
+        puzzles, elapsed = timed(lambda: [generator.puzzle() for _ in range(count)])
+        clues = sum(len(rectangles) for _, rectangles in puzzles) / count
+        print(f'{n:>3}x{n:<3} {count / elapsed:>10.1f} {clues:>6.1f}')
+
+
+NURIKABE_BOARDS = [
+    [
+        [0, 0, 5, 0, 0],
+        [0, 0, 0, 3, 0],
+        [0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0],
+        [1, 0, 3, 0, 0],
+    ],
+    [
+        [0, 0, 0, 0, 0, 0, 0, 1, 0, 0],
+        [0, 0, 0, 0, 0, 6, 0, 0, 3, 0],
+        [0, 0, 0, 0, 0, 0, 4, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 1, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 2, 0, 0, 1, 0],
+        [0, 0, 0, 0, 0, 0, 0, 1, 0, 0],
+        [0, 0, 0, 2, 0, 0, 0, 0, 0, 0],
+        [0, 8, 0, 0, 4, 0, 0, 0, 0, 2],
+        [0, 0, 2, 0, 0, 0, 0, 0, 0, 0],
+    ],
+]
+
+
+def benchmark_nurikabe(rng):
+    # Model size and solve time of every connectivity strategy, with and without deduction beforehand
+    # (for 'lazy', the model before any cut is added), and the fraction of cells decided by deduction
+    print(f'{"size":>7} {"strategy":>9} {"deduce":>7} {"resolved":>9} {"variables":>10} {"constraints":>12} '
+          f'{"solve (s)":>10}')
+    for rows in NURIKABE_BOARDS:
+        n = len(rows)
+        for strategy in NURIKABE_STRATEGIES:
+            for deduce in (False, True):
+                nurikabe = Nurikabe(rows, strategy, deduce)
+                nurikabe.island_constraints()
+                nurikabe.sea_constraints()
+                proto = nurikabe.model.Proto()
+                _, solve = timed(lambda: Nurikabe(rows, strategy, deduce).solve())
+                print(f'{n:>3}x{n:<3} {strategy:>9} {str(deduce):>7} {nurikabe.resolved:>9.0%} '
+                      f'{len(proto.variables):>10} {len(proto.constraints):>12} {solve:>10.4f}')
+
+
+def benchmark_nurikabe_generator(rng):
+    # Uniquely solvable puzzles generated per second, produced in bulk as for the puzzle pool
+    print(f'{"size":>7} {"puzzles/s":>10} {"islands":>8} {"largest":>8}')
+    for n, count in ((5, 20), (7, 20), (10, 5)):
+        generator = NurikabeGenerator(n, rng.random())
+        puzzles, elapsed = timed(lambda: list(generator.puzzles(count)))
+        clues = [[x for row in rows for x in row if x] for rows, _ in puzzles]
+        islands = sum(map(len, clues)) / count
+        largest = sum(map(max, clues)) / count
+        print(f'{n:>3}x{n:<3} {count / elapsed:>10.2f} {islands:>8.1f} {largest:>8.1f}')
+
+
+def random_numberlink(n, rng):
+    # Clue grid of a random Hamiltonian path over the board cut into paths of 3 to n cells, endpoints as clues
+    path = NumberlinkGenerator(n, rng.random()).hamiltonian_path()
+    rows = [[0] * n for _ in range(n)]
+    start, colour = 0, 0
+    while start < n * n:
+        length = rng.randint(3, n)
+        if n * n - start - length < 3:
+            length = n * n - start
+        colour += 1
+        for idx in (path[start], path[start + length - 1]):
+            rows[idx // n][idx % n] = colour
+        start += length
+    return rows
+
+
+def benchmark_numberlink(rng):
+    # Model size and solve time of both formulations, the edge one with and without propagation beforehand (the
+    # reach one does not use it), and the fraction of cells whose path propagation found (endpoints included),
+    # then the time the native router takes.
+    # The formulations do not solve the same puzzle (see Numberlink.solve): a random board always has a solution
+    # under the edge rules, not always under the reach ones, so their times are not those of the same search.
+    # A solve is stopped after time_limit seconds
+    time_limit = 30
+    print(f'{"size":>7} {"colours":>8} {"formulation":>12} {"propagate":>10} {"resolved":>9} {"variables":>10} '
+          f'{"constraints":>12} {"solve (s)":>10}')
+    for n in (10, 15, 20):
+        rows = random_numberlink(n, rng)
+        colours = max(map(max, rows))
+        for formulation in NUMBERLINK_FORMULATIONS:
+            for propagate in (False, True) if formulation == 'edges' else (False,):
+                numberlink = Numberlink(rows, propagate)
+                if formulation == 'edges':
+                    numberlink.edge_constraints()
+                else:
+                    numberlink.constraints()
+                proto = numberlink.model.Proto()
+                solution, solve = timed(Numberlink(rows, propagate).solve, formulation, time_limit, native=False)
+                result = f'{solve:>10.4f}' if solution is not None else f'{"timeout":>10}'
+                print(f'{n:>3}x{n:<3} {colours:>8} {formulation:>12} {str(propagate):>10} {numberlink.resolved:>9.0%} '
+                      f'{len(proto.variables):>10} {len(proto.constraints):>12} {result}')
+        numberlink = Numberlink(rows, propagate=False)
+        router = NumberlinkRouter(n, [(path.start, path.end) for path in numberlink.paths])
+        solution, solve = timed(router.route, time_limit)
+        result = f'{solve:>10.4f}' if solution is not None else f'{"timeout":>10}'
+        print(f'{n:>3}x{n:<3} {colours:>8} {"router":>12} {"-":>10} {"-":>9} {"-":>10} {"-":>12} {result}')
+
+
+def benchmark_numberlink_generator(rng):
+    # Uniquely solvable puzzles generated per second, produced in bulk as for the puzzle pool
+    print(f'{"size":>7} {"puzzles/s":>10} {"paths":>6}')
+    for n, count in ((7, 20), (10, 10), (15, 5)):
+        generator = NumberlinkGenerator(n, rng.random())
+        puzzles, elapsed = timed(lambda: list(generator.puzzles(count)))
+        paths = sum(max(map(max, rows)) for rows, _ in puzzles) / count
+        print(f'{n:>3}x{n:<3} {count / elapsed:>10.2f} {paths:>6.1f}')
+
+
+def random_hashiwokakero(n, rng, islands):
+    # Clue grid of a random connected bridge graph: a spanning tree of the islands plus bridges closing cycles
+    generator = HashiwokakeroGenerator(n, rng.random(), islands)
+    grid, bridges = generator.tree()
+    generator.extra(grid, bridges)
+    return generator.rows(grid)
+
+
+def benchmark_hashiwokakero(rng):
+    # Time to build the model (neighbours, deduction, bridges, crossings, connectivity) on boards with many
+    # islands, and the fraction of bridges deduction fixed
+    print(f'{"size":>7} {"islands":>8} {"crossings":>10} {"fixed":>6} {"build (s)":>10}')
+    for n, islands in ((25, 100), (40, 250), (60, 500)):
+        rows = random_hashiwokakero(n, rng, islands)
+        start = time.perf_counter()
+        hashiwokakero = Hashiwokakero(rows)
+        hashiwokakero.constraints()
+        build = time.perf_counter() - start
+        print(f'{n:>3}x{n:<3} {len(hashiwokakero.nodes):>8} {len(hashiwokakero.crossings()):>10} '
+              f'{hashiwokakero.resolved:>6.0%} {build:>10.4f}')
+    # Solve time of every connectivity encoding on 25x25 boards, with and without deduction beforehand.
+    # A solve is stopped after time_limit seconds
+    time_limit = 30
+    print(f'{"size":>7} {"islands":>8} {"connectivity":>13} {"deduce":>7} {"solve (s)":>10}')
+    for islands in (60, 100, 140):
+        rows = random_hashiwokakero(25, rng, islands)
+        for connectivity in HASHIWOKAKERO_CONNECTIVITY:
+            for deduce in (False, True):
+                hashiwokakero = Hashiwokakero(rows, deduce)
+                try:
+                    solution, solve = timed(hashiwokakero.solve, connectivity, time_limit)
+                    result = f'{solve:>10.4f}' if solution is not None else f'{"none":>10}'
+                except TimeoutError:
+                    result = f'{"timeout":>10}'
+                print(f'{25:>3}x{25:<3} {len(hashiwokakero.nodes):>8} {connectivity:>13} {str(deduce):>7} {result}')
+
+
+def benchmark_hashiwokakero_generator(rng):
+    # Uniquely solvable puzzles generated per second, produced in bulk as for the puzzle pool
+    print(f'{"size":>7} {"puzzles/s":>10} {"islands":>8}')
+    for n, count in ((7, 20), (10, 10), (15, 5), (25, 5)):
+        generator = HashiwokakeroGenerator(n, rng.random())
+        puzzles, elapsed = timed(lambda: list(generator.puzzles(count)))
+        islands = sum(sum(value > 0 for row in rows for value in row) for rows, _ in puzzles) / count
+        print(f'{n:>3}x{n:<3} {count / elapsed:>10.2f} {islands:>8.1f}')
+
+
+BENCHMARKS = {
+    'sudoku': benchmark_sudoku,
+    'futoshiki': benchmark_futoshiki,
+    'futoshiki_generator': benchmark_futoshiki_generator,
+    'hashiwokakero': benchmark_hashiwokakero,
+    'hashiwokakero_generator': benchmark_hashiwokakero_generator,
+    'numberlink': benchmark_numberlink,
+    'numberlink_generator': benchmark_numberlink_generator,
+    'nurikabe': benchmark_nurikabe,
+    'nurikabe_generator': benchmark_nurikabe_generator,
+    'shikaku': benchmark_shikaku,
+    'shikaku_generator': benchmark_shikaku_generator,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f'== {name} ==')
+        BENCHMARKS[name](random.Random(0))
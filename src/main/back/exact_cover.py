@@ -0,0 +1,84 @@
+class SearchLimitReached(Exception):
+    pass
+
+
+class ExactCover:
+    """
+    Exact cover search (Knuth's Algorithm X).
+    Columns are the constraints that must be covered exactly once, rows are the choices that cover them.
+    The matrix is stored as a dict of sets (column -> rows covering it) and columns are removed and restored
+    in place while searching, which plays the role of the "dancing links" of DLX without the linked lists.
+    """
+
+    def __init__(self, rows, columns=None, node_limit=None):
+        # rows is a dict mapping a row id to the list of columns it covers
+        # columns are the columns that must be covered, even if no row covers them (the search then fails at once)
+        self.rows = rows
+        self.columns = {c: set() for c in columns} if columns is not None else {}
+        for r, cols in rows.items():
+            for c in cols:
+                self.columns.setdefault(c, set()).add(r)
+        self.node_limit = node_limit  # maximum number of rows tried before giving up
+        self.nodes = 0
+
+    def select(self, r):
+        # Covers every column of row r and removes every row that conflicts with it
+        removed = []
+        for j in self.rows[r]:
+            for i in self.columns[j]:
+                for k in self.rows[i]:
+                    if k != j:
+                        self.columns[k].remove(i)
+            removed.append(self.columns.pop(j))
+        return removed
+
+    def deselect(self, r, removed):
+        # Exact inverse of select, columns are restored in reverse order
+        for j in reversed(self.rows[r]):
+            self.columns[j] = removed.pop()
+            for i in self.columns[j]:
+                for k in self.rows[i]:
+                    if k != j:
+                        self.columns[k].add(i)
+
+    def search(self, partial=None):
+        # Yields every exact cover, as a list of row ids
+        if partial is None:
+            partial = []
+        if not self.columns:
+            yield list(partial)
+            return
+        # Branch on the column with the fewest rows left (a naked or hidden single when its size is 1)
+        column, fewest = None, None
+        for c, covering in self.columns.items():
+            if fewest is None or len(covering) < fewest:
+                column, fewest = c, len(covering)
+                if fewest <= 1:
+                    break
+        for r in list(self.columns[column]):
+            self.nodes += 1
+            if self.node_limit is not None and self.nodes > self.node_limit:
+                raise SearchLimitReached(f'Exact cover search exceeded {self.node_limit} nodes')
+            partial.append(r)
+            removed = self.select(r)
+            try:
+                yield from self.search(partial)
+            finally:
+                # also runs when the caller stops early, so the matrix is always left intact
+                self.deselect(r, removed)
+                partial.pop()
+
+    def solve(self):
+        # Returns the first exact cover found, or None if there is none
+        for solution in self.search():
+            return solution
+        return None
+
+    def count(self, limit=None):
+        # Counts the exact covers, stopping as soon as limit is reached
+        count = 0
+        for _ in self.search():
+            count += 1
+            if limit is not None and count >= limit:
+                break
+        return count
@@ -1,21 +1,24 @@
 from ortools.sat.python import cp_model
-from puzzle import Puzzle
+from latin_square import LatinSquare
 
 
-class Futoshiki(Puzzle):
-    def __init__(self, rows, ineqs):
+class Futoshiki(LatinSquare):
+    def __init__(self, rows, ineqs, tighten=True):
         super().__init__(len(rows[0]), rows)
         try:
             assert len(self.grid) == self.n * self.n
         except AssertionError as e:
             raise e
         self.ineqs = ineqs
-        self.model = cp_model.CpModel()  # Create the model
         self.DOMAIN = self.n
-        self.grid_expr = [
-            self.model.new_int_var(1, self.DOMAIN, 'x[%i]' % i) if x == 0 else self.model.new_int_var(x, x, 'x[%i]' % i)
-            for i, x
-            in enumerate(self.grid)]
+        # Bounds implied by the inequality chains, None if the inequalities contradict each other or the givens;
+        # the model is then left with full domains and never handed to the solver
+        bounds = self.bounds() if tighten else None
+        self.feasible = bounds is not None or not tighten
+        if bounds is None:
+            bounds = [(1, self.DOMAIN) if x == 0 else (x, x) for x in self.grid]
+        # The AllDifferent constraints on rows and columns come with the shared model
+        self.new_model([cp_model.Domain(lower, upper) for lower, upper in bounds])
 
     def get_rows(self, grid):
         rows = super().get_rows(grid)
@@ -25,17 +28,46 @@ class Futoshiki(Puzzle):
         cols = super().get_cols(grid)
         return cols
 
-    def constraints(self, grid):
-        # AllDifferent on rows
-        rows = self.get_rows(grid)
-        for row in rows:
-            self.model.add_all_different(row)
+    def bounds(self):
+        # Tightest (lower, upper) bounds of every cell given the inequalities, or None if they are infeasible.
+        # The inequalities form a graph with an edge a -> b for every a < b: a cycle is a contradiction,
+        # otherwise a cell is at least one more than every cell before it and one less than every cell after it,
+        # i.e. the longest paths to and from it, computed in one pass each way along a topological order
+        size = len(self.grid)
+        successors = [[] for _ in range(size)]
+        in_degree = [0] * size
+        for inequality in self.ineqs:
+            if inequality[0] == '<':
+                smaller, greater = inequality[1], inequality[2]
+            elif inequality[0] == '>':
+                smaller, greater = inequality[2], inequality[1]
+            else:
+                continue
+            successors[smaller].append(greater)
+            in_degree[greater] += 1
 
-        # AllDifferent on columns
-        cols = self.get_cols(grid)
-        for col in cols:
-            self.model.add_all_different(col)
+        order = [i for i in range(size) if in_degree[i] == 0]
+        for i in order:  # Kahn's algorithm, order grows while it is walked
+            for j in successors[i]:
+                in_degree[j] -= 1
+                if in_degree[j] == 0:
+                    order.append(j)
+        if len(order) < size:
+            return None  # a cycle of inequalities
 
+        lower = [x if x != 0 else 1 for x in self.grid]
+        upper = [x if x != 0 else self.DOMAIN for x in self.grid]
+        for i in order:
+            for j in successors[i]:
+                lower[j] = max(lower[j], lower[i] + 1)
+        for i in reversed(order):
+            for j in successors[i]:
+                upper[i] = min(upper[i], upper[j] - 1)
+        if any(lower[i] > upper[i] for i in range(size)):
+            return None
+        return list(zip(lower, upper))
+
+    def constraints(self, grid):
         # Inequalities
         for inequality in self.ineqs:
             if inequality[0] == '<':
@@ -44,6 +76,8 @@ class Futoshiki(Puzzle):
                 self.model.Add(grid[inequality[1]] > grid[inequality[2]])
 
     def solve(self):
+        if not self.feasible:
+            return None
         self.constraints(self.grid_expr)
         solver = cp_model.CpSolver()
         status = solver.Solve(self.model)
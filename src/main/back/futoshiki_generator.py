@@ -0,0 +1,141 @@
+import random
+import threading
+
+from ortools.sat.python import cp_model
+from futoshiki import Futoshiki
+
+_GENERATORS = {}
+_GENERATORS_LOCK = threading.Lock()
+
+
+def get_generator(n):
+    # One generator, hence one model, per grid size for the whole process
+    with _GENERATORS_LOCK:
+        if n not in _GENERATORS:
+            _GENERATORS[n] = FutoshikiGenerator(n)
+        return _GENERATORS[n]
+
+
+class FutoshikiGenerator:
+    """
+    Generates Futoshiki puzzles with a unique solution, all on a single model built once.
+    The model is an empty n x n Futoshiki in which every possible clue has a literal:
+    eq[i][v] is true iff cell i holds v, lt[(a, b)] forces cell a below its neighbour b.
+    A puzzle is a set of clue literals passed to CP-SAT as assumptions, so nothing has to be rebuilt
+    between puzzles. Uniqueness against the target solution is checked with a single blocking clause
+    (the grid differs from the target somewhere): while the solver still finds a solution, a clue that the
+    target satisfies but that counter-example breaks is added, until the model becomes infeasible.
+    A CP-SAT solve costs about 10 ms on a 7x7 whatever the clues, so the number of solves is what matters:
+    a counter-example far from the target gets one new clue per CELLS_PER_CLUE cells it differs in,
+    which brings a 7x7 puzzle down to about 7 solves for a few more clues than one clue per solve.
+    """
+
+    INEQUALITY_RATE = 0.8  # chance of picking an inequality rather than a given when both can break a solution
+    CELLS_PER_CLUE = 4
+
+    def __init__(self, n):
+        self.n = n
+        self.size = n * n
+        self.lock = threading.Lock()
+        self.futoshiki = Futoshiki([[0] * n for _ in range(n)], [])
+        self.model = self.futoshiki.model
+        grid = self.futoshiki.grid_expr
+        self.eq = []
+        for i in range(self.size):
+            literals = [None]
+            for v in range(1, n + 1):
+                literal = self.model.new_bool_var(f'eq[{i}][{v}]')
+                self.model.Add(grid[i] == v).OnlyEnforceIf(literal)
+                self.model.Add(grid[i] != v).OnlyEnforceIf(literal.Not())
+                literals.append(literal)
+            self.eq.append(literals)
+        self.lt = {}
+        for a, b in self.adjacent_pairs():
+            for smaller, greater in ((a, b), (b, a)):
+                literal = self.model.new_bool_var(f'lt[{smaller}][{greater}]')
+                self.model.Add(grid[smaller] < grid[greater]).OnlyEnforceIf(literal)
+                self.lt[(smaller, greater)] = literal
+
+    def adjacent_pairs(self):
+        # (a, b) with b right of or below a
+        n = self.n
+        return [(i, j) for i in range(self.size) for j in (i + 1, i + n)
+                if j < self.size and (j != i + 1 or j % n != 0)]
+
+    def latin_square(self, rng):
+        # Random Latin square, row by row: every row is a random perfect matching between the columns and
+        # the symbols they do not hold yet, which always exists for a Latin rectangle (Hall's theorem)
+        n = self.n
+        square = []
+        for _ in range(n):
+            allowed = [[v for v in range(1, n + 1) if all(row[c] != v for row in square)] for c in range(n)]
+            match = {}  # symbol -> column
+
+            def augment(c, seen):
+                for v in rng.sample(allowed[c], len(allowed[c])):
+                    if v not in seen:
+                        seen.add(v)
+                        if v not in match or augment(match[v], seen):
+                            match[v] = c
+                            return True
+                return False
+
+            for c in rng.sample(range(n), n):
+                augment(c, set())
+            row = [0] * n
+            for v, c in match.items():
+                row[c] = v
+            square.append(row)
+        return [x for row in square for x in row]
+
+    def solve(self, clues):
+        self.model.ClearAssumptions()
+        self.model.AddAssumptions(clues)
+        solver = cp_model.CpSolver()
+        solver.parameters.num_workers = 1
+        # Presolve, probing and symmetry detection cost more than the search itself on such a small model
+        solver.parameters.cp_model_presolve = False
+        solver.parameters.cp_model_probing_level = 0
+        solver.parameters.symmetry_level = 0
+        solver.parameters.linearization_level = 0
+        status = solver.Solve(self.model)
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            return [solver.Value(x) for x in self.futoshiki.grid_expr]
+        return None
+
+    def puzzle(self, seed=None):
+        # Returns (rows, ineqs) in the Futoshiki constructor format, ineqs only between adjacent cells
+        rng = random.Random(seed)
+        with self.lock:
+            target = self.latin_square(rng)
+            proto = self.model.Proto()
+            blocking = len(proto.constraints)
+            self.model.AddBoolOr([self.eq[i][target[i]].Not() for i in range(self.size)])
+            givens, ineqs, clues = {}, [], []
+            try:
+                while True:
+                    other = self.solve(clues)
+                    if other is None:
+                        break
+                    broken = [(a, b) for a, b in self.adjacent_pairs()
+                              if (target[a] < target[b]) != (other[a] < other[b])]
+                    differing = [i for i in range(self.size) if other[i] != target[i]]
+                    for _ in range(max(1, len(differing) // self.CELLS_PER_CLUE)):
+                        if broken and (rng.random() < self.INEQUALITY_RATE or not differing):
+                            a, b = broken.pop(rng.randrange(len(broken)))
+                            if target[a] < target[b]:
+                                clues.append(self.lt[(a, b)])
+                                ineqs.append(['<', a, b])
+                            else:
+                                clues.append(self.lt[(b, a)])
+                                ineqs.append(['>', a, b])
+                        elif differing:
+                            i = differing.pop(rng.randrange(len(differing)))
+                            givens[i] = target[i]
+                            clues.append(self.eq[i][target[i]])
+            finally:
+                # back to the bare model for the next puzzle
+                del proto.constraints[blocking:]
+                self.model.ClearAssumptions()
+        rows = [[givens.get(r * self.n + c, 0) for c in range(self.n)] for r in range(self.n)]
+        return rows, ineqs
@@ -1,9 +1,17 @@
+import bisect
+import time
+
 from ortools.sat.python import cp_model
 from puzzle import Puzzle
 
 
+CONNECTIVITY = ['reach', 'flow', 'lazy']
+
+
 class Hashiwokakero(Puzzle):
-    def __init__(self, rows):
+    def __init__(self, rows, deduce=True):
+        # With deduce, the number of bridges each pair of islands can hold is narrowed by simple rules before the
+        # model is built (see deduce)
         super().__init__(len(rows[0]), rows)
         try:
             assert len(self.grid) == self.n * self.n
@@ -16,6 +24,20 @@ class Hashiwokakero(Puzzle):
             if self.grid[i] != 0:
                 self.nodes.append(self.Node(i, self.grid[i], self))
                 self.nodes_dict[i] = self.nodes[-1]
+        # First node encountered for each orthogonal direction: up, down, left, right
+        for near in self.nearest():
+            for node in self.nodes:
+                if near[node.index] is not None:
+                    node.neighbors.append(self.nodes_dict[near[node.index]])
+        # Lowest and highest number of bridges of every candidate bridge (islands in index order), and the
+        # fraction of them that deduction fixed
+        self.bounds = {(node.index, neighbor.index): [0, 2] for node in self.nodes for neighbor in node.neighbors
+                       if node.index < neighbor.index}
+        self.resolved = 0.0
+        self.consistent = True
+        if deduce:
+            self.resolved = self.deduce()
+            self.consistent = self.resolved is not None
 
     class Node:
         def __init__(self, pos, value, neighbors=None):
@@ -24,161 +46,245 @@ class Hashiwokakero(Puzzle):
             self.neighbors = []  # First node encountered for each orthogonal direction
             self.edges = {}  # Edges to the neighbors
 
-        def set_neighbors(self, hashiwokakero):
-            # Set the neighbors for each direction
-            if self.value == 0:
-                return []
-            r = self.index // hashiwokakero.n
-            c = self.index % hashiwokakero.n
-            if r > 0:
-                for i in range(r - 1, -1, -1):
-                    if hashiwokakero.grid[i * hashiwokakero.n + c] != 0:
-                        index = i * hashiwokakero.n + c
-                        self.neighbors.append(hashiwokakero.nodes_dict[index])
-                        break
-            if r < hashiwokakero.n - 1:
-                for i in range(r + 1, hashiwokakero.n):
-                    if hashiwokakero.grid[i * hashiwokakero.n + c] != 0:
-                        index = i * hashiwokakero.n + c
-                        self.neighbors.append(hashiwokakero.nodes_dict[index])
-                        break
-            if c > 0:
-                for i in range(c - 1, -1, -1):
-                    if hashiwokakero.grid[r * hashiwokakero.n + i] != 0:
-                        index = r * hashiwokakero.n + i
-                        self.neighbors.append(hashiwokakero.nodes_dict[index])
-                        break
-            if c < hashiwokakero.n - 1:
-                for i in range(c + 1, hashiwokakero.n):
-                    if hashiwokakero.grid[r * hashiwokakero.n + i] != 0:
-                        index = r * hashiwokakero.n + i
-                        self.neighbors.append(hashiwokakero.nodes_dict[index])
-                        break
-
-    def constraints(self):
-        visited = set()
-        reach = {}
+    def nearest(self):
+        # Index of the nearest island above, below, left and right of every cell (None if there is none),
+        # each found in a single pass over the grid from the opposite side
+        n = self.n
+        up, down, left, right = ([None] * len(self.grid) for _ in range(4))
+        for i in range(n, len(self.grid)):
+            up[i] = i - n if self.grid[i - n] else up[i - n]
+        for i in range(len(self.grid) - n - 1, -1, -1):
+            down[i] = i + n if self.grid[i + n] else down[i + n]
+        for i in range(len(self.grid)):
+            if i % n > 0:
+                left[i] = i - 1 if self.grid[i - 1] else left[i - 1]
+        for i in range(len(self.grid) - 1, -1, -1):
+            if i % n < n - 1:
+                right[i] = i + 1 if self.grid[i + 1] else right[i + 1]
+        return up, down, left, right
+
+    def deduce(self):
+        # Narrows self.bounds with simple rules until none applies:
+        # - a pair of islands holds at most min(2, value_a, value_b) bridges
+        # - unless they are the only islands, two 1s cannot be joined and two 2s cannot be joined twice, they would
+        #   be cut off from the others
+        # - an island needs at least its value minus what its other bridges can hold (so an island whose value is
+        #   all its neighbours can take gets every bridge fixed) and at most its value minus what they must hold
+        # - a bridge that must be drawn rules out the bridges crossing it
+        # Returns the fraction of candidate bridges fixed, or None if some cannot hold any number of bridges
+        bounds = self.bounds
+        isolated = len(self.nodes) > 2
+        for (a, b), bound in bounds.items():
+            bound[1] = min(2, self.grid[a], self.grid[b])
+            if isolated and self.grid[a] == self.grid[b] <= 2:
+                bound[1] = self.grid[a] - 1
+        crossing = {pair: [] for pair in bounds}
+        for horizontal, vertical in self.crossings():
+            crossing[horizontal].append(vertical)
+            crossing[vertical].append(horizontal)
+        changed = True
+        while changed:
+            changed = False
+            for node in self.nodes:
+                pairs = [self.bridge(node, neighbor) for neighbor in node.neighbors]
+                if not pairs:  # an island in no line with another
+                    return None
+                for pair in pairs:
+                    low = node.value - sum(bounds[other][1] for other in pairs if other != pair)
+                    high = node.value - sum(bounds[other][0] for other in pairs if other != pair)
+                    bound = [max(bounds[pair][0], low), min(bounds[pair][1], high)]
+                    if bound[0] > bound[1]:
+                        return None
+                    if bound != bounds[pair]:
+                        bounds[pair] = bound
+                        changed = True
+            for pair, (low, _) in bounds.items():
+                if low > 0:
+                    for other in crossing[pair]:
+                        if bounds[other][0] > 0:
+                            return None
+                        if bounds[other][1] > 0:
+                            bounds[other][1] = 0
+                            changed = True
+        if not bounds:
+            return 1.0
+        return sum(low == high for low, high in bounds.values()) / len(bounds)
+
+    def constraints(self, connectivity='reach'):
+        assert connectivity in CONNECTIVITY, \
+            f'Unknown connectivity {connectivity}, expected one of {", ".join(CONNECTIVITY)}'
+        self.used = {}  # whether a bridge is drawn, for every pair of neighbours
         for node in self.nodes:
-            visited.add(node.index)
-            node.set_neighbors(self)
-            # Set the number of neighbors for each node
             for neighbor in node.neighbors:
-                if neighbor.index not in visited:  # we don't want to add the same edge twice
-                    node.edges[neighbor.index] = self.model.new_int_var(0, 2, f'edge_{node.index}_{neighbor.index}')
+                if node.index < neighbor.index:  # we don't want to add the same edge twice
+                    low, high = self.bounds[node.index, neighbor.index]
+                    node.edges[neighbor.index] = self.model.new_int_var(low, high,
+                                                                        f'edge_{node.index}_{neighbor.index}')
                     neighbor.edges[node.index] = node.edges[neighbor.index]
-                    # for each neighbor, the number of edges can be at most 2
+                    # for each neighbor, the number of edges can be at most 2 (less after deduction)
                     # if there is and edge between the node and its neighbor,
                     # there is and edge between the neighbor and the node;
                     # they are equal in value (null, simple or double)
+                    used = self.model.new_bool_var(f'used_{node.index}_{neighbor.index}')
+                    self.model.add(node.edges[neighbor.index] > 0).OnlyEnforceIf(used)
+                    self.model.add(node.edges[neighbor.index] == 0).OnlyEnforceIf(used.Not())
+                    self.used[node.index, neighbor.index] = used
+        for node in self.nodes:
             node_edges = [node.edges[neighbor.index] for neighbor in node.neighbors]
             self.model.add(sum(node_edges) == node.value)
             # The sum of the number of edges for each node must be equal to the value of the node
+
+        # then we enforce the constraint that edges cannot intersect:
+        # of two bridges that cross, at most one is drawn
+        for horizontal, vertical in self.crossings():
+            self.model.AddBoolOr([self.used[horizontal].Not(), self.used[vertical].Not()])
+
+        if connectivity == 'reach':
+            self.reach_constraints()
+        elif connectivity == 'flow':
+            self.flow_constraints()
+
+    def bridge(self, node, neighbor):
+        # Key of the bridge between two neighbours in bounds and used
+        return min(node.index, neighbor.index), max(node.index, neighbor.index)
+
+    def reach_constraints(self):
+        # Every island but the first one is one bridge further from it than one of its neighbours,
+        # through a drawn bridge
+        reach = {}
+        for node in self.nodes:
+            # Set the number of neighbors for each node
             reach[node.index] = self.model.new_int_var(0, len(self.nodes), f'reach_{node.index}')
             if node == self.nodes[0]:
                 self.model.add(reach[node.index] == 0)
             else:
                 self.model.add(reach[node.index] > 0)
-
-        # then we enforce the constraint that edges cannot intersect
-        # i.e. if there is an edge existing (perpendicular) somewhere between the node and its neighbor
-        # then you cannot draw an edge between them.
-        # we don't need to check all nodes, only the half of the grid that is in the same direction
-        # should be a reasonable amount of computation
-        # we first need every edge variable to be established however
-        # this is why this is done after the previous loop
-        visited = set()
         for node in self.nodes:
-            visited.add(node.index)
             neighbor_conditions = []
             for neighbor in node.neighbors:
                 if node != self.nodes[0]:
                     smaller_reach = self.model.new_bool_var(f'smaller_reach_{node.index}_{neighbor.index}')
                     self.model.add(reach[node.index] == reach[neighbor.index] + 1).OnlyEnforceIf(smaller_reach)
-                    self.model.add(reach[node.index] != reach[neighbor.index] + 1).OnlyEnforceIf(smaller_reach.Not())
+                    self.model.AddImplication(smaller_reach, self.used[self.bridge(node, neighbor)])
                     neighbor_conditions.append(smaller_reach)
-
-                if neighbor not in visited:
-                    intersecting_edges = []
-                    if node.index < neighbor.index:  # if the node is above the neighbor
-                        # check all the rows between the node and the neighbor
-                        for other_node in self.nodes:
-                            if node.index // self.n < other_node.index // self.n < neighbor.index // self.n:
-                                other_neighbors = other_node.neighbors
-                                onc = other_node.index % self.n  # other node column
-                                for other_neighbor in other_neighbors:
-                                    if other_neighbor.index // self.n == other_node.index // self.n:  # horizontal neighbors
-                                        onbc = other_neighbor.index % self.n  # other neighbor column
-                                        if onc < node.index % self.n < onbc or onc < neighbor.index % self.n < onbc:
-                                            # if the other node and its neighbors are left and right of the node
-                                            # (or right and left of it)
-                                            # then there is a possibility of intersection
-                                            intersecting_edges.append(other_node.edges[other_neighbor.index])
-                    elif node.index > neighbor.index:  # if the node is below the neighbor
-                        # check all the rows between the node and the neighbor
-                        for other_node in self.nodes:
-                            if neighbor.index // self.n < other_node.index // self.n < node.index // self.n:
-                                other_neighbors = other_node.neighbors
-                                onc = other_node.index % self.n
-                                for other_neighbor in other_neighbors:
-                                    if other_neighbor.index // self.n == other_node.index // self.n:
-                                        onbc = other_neighbor.index % self.n
-                                        if onc < node.index % self.n < onbc or onc < neighbor.index % self.n < onbc:
-                                            intersecting_edges.append(other_node.edges[other_neighbor.index])
-                    elif node.index % self.n < neighbor.index % self.n:  # if the node is left of the neighbor
-                        # check all the columns between the node and the neighbor
-                        for other_node in self.nodes:
-                            if node.index % self.n < other_node.index % self.n < neighbor.index % self.n:
-                                other_neighbors = other_node.neighbors
-                                onr = other_node.index // self.n
-                                for other_neighbor in other_neighbors:
-                                    if other_neighbor.index // self.n == other_node.index // self.n:
-                                        onbr = other_neighbor.index // self.n
-                                        if onr < node.index // self.n < onbr or onr < neighbor.index // self.n < onbr:
-                                            intersecting_edges.append(other_node.edges[other_neighbor.index])
-                    elif node.index % self.n > neighbor.index % self.n:  # if the node is right of the neighbor
-                        # check all the columns between the node and the neighbor
-                        for other_node in self.nodes:
-                            if neighbor.index % self.n < other_node.index % self.n < node.index % self.n:
-                                other_neighbors = other_node.neighbors
-                                onr = other_node.index // self.n
-                                for other_neighbor in other_neighbors:
-                                    if other_neighbor.index // self.n == other_node.index // self.n:
-                                        onbr = other_neighbor.index // self.n
-                                        if onr < node.index // self.n < onbr or onr < neighbor.index // self.n < onbr:
-                                            intersecting_edges.append(other_node.edges[other_neighbor.index])
-                    # we now have all the intersecting edges
-                    intedge = self.model.new_bool_var(f'intedge_{node.index}_{neighbor.index}')
-                    self.model.add(sum(intersecting_edges) != 0).OnlyEnforceIf(intedge)
-                    self.model.add(sum(intersecting_edges) == 0).OnlyEnforceIf(intedge.Not())
-                    self.model.add(node.edges[neighbor.index] == 0).OnlyEnforceIf(intedge)
-                    self.model.add(neighbor.edges[node.index] == 0).OnlyEnforceIf(intedge)
-                    # this above means:
-                    # either there are edges perpendicular to the potential edge between the node and the neighbor
-                    # and the edge between them is null
-                    # or there are no edges perpendicular to the potential edge between the node and the neighbor
-                    # and the edge between them can be drawn if needed
             if node != self.nodes[0]:
                 self.model.AddAtLeastOne(neighbor_conditions)
 
-    def solve(self):
-        self.constraints()
+    def flow_constraints(self):
+        # Single-commodity flow: the first island sends one unit to every other island, which keeps one,
+        # along drawn bridges only
+        total = len(self.nodes) - 1
+        flow = {}
+        for node in self.nodes:
+            for neighbor in node.neighbors:
+                flow[node.index, neighbor.index] = self.model.new_int_var(0, total,
+                                                                          f'flow_{node.index}_{neighbor.index}')
+                self.model.add(flow[node.index, neighbor.index] == 0).OnlyEnforceIf(
+                    self.used[self.bridge(node, neighbor)].Not())
+        for node in self.nodes:
+            outgoing = sum(flow[node.index, neighbor.index] for neighbor in node.neighbors)
+            incoming = sum(flow[neighbor.index, node.index] for neighbor in node.neighbors)
+            self.model.add(outgoing - incoming == (total if node == self.nodes[0] else -1))
+
+    def connectivity_cuts(self, drawn):
+        # Adds to the model a cut for every group of islands that the drawn bridges leave apart from the others:
+        # one of the bridges out of it must be drawn. Returns how many were added
+        parts = []
+        seen = set()
+        for node in self.nodes:
+            if node.index not in seen:
+                part = {node.index}
+                stack = [node]
+                while stack:
+                    current = stack.pop()
+                    for neighbor in current.neighbors:
+                        if neighbor.index not in part and drawn[self.bridge(current, neighbor)]:
+                            part.add(neighbor.index)
+                            stack.append(neighbor)
+                parts.append(part)
+                seen |= part
+        if len(parts) == 1:
+            return 0
+        for part in parts:
+            self.model.AddBoolOr([self.used[self.bridge(self.nodes_dict[idx], neighbor)] for idx in part
+                                  for neighbor in self.nodes_dict[idx].neighbors if neighbor.index not in part])
+        return len(parts)
+
+    def crossings(self):
+        # Pairs of candidate bridges that cross, as ((left, right), (top, bottom)) island indexes.
+        # Sweep over the rows: a vertical bridge is open in the rows strictly between its islands, and a
+        # horizontal bridge crosses the open vertical bridges whose column is strictly between its islands.
+        # Only one vertical bridge can be open in a column at a time, the open columns are kept sorted
+        horizontal = [[] for _ in range(self.n)]  # row -> (left column, right column, bridge)
+        opening = [[] for _ in range(self.n)]  # row -> (column, bridge) of the vertical bridges opening
+        closing = [[] for _ in range(self.n)]  # row -> columns of the vertical bridges closing
+        for node in self.nodes:
+            for neighbor in node.neighbors:
+                if node.index < neighbor.index:
+                    r, c = divmod(node.index, self.n)
+                    nr, nc = divmod(neighbor.index, self.n)
+                    if r == nr and nc - c > 1:
+                        horizontal[r].append((c, nc, (node.index, neighbor.index)))
+                    elif c == nc and nr - r > 1:
+                        opening[r + 1].append((c, (node.index, neighbor.index)))
+                        closing[nr].append(c)
+        columns = []
+        vertical = {}  # column -> open vertical bridge
+        crossings = []
+        for r in range(self.n):
+            for c in closing[r]:
+                columns.pop(bisect.bisect_left(columns, c))
+                del vertical[c]
+            for c, bridge in opening[r]:
+                bisect.insort(columns, c)
+                vertical[c] = bridge
+            for left, right, bridge in horizontal[r]:
+                for c in columns[bisect.bisect_right(columns, left):bisect.bisect_left(columns, right)]:
+                    crossings.append((bridge, vertical[c]))
+        return crossings
+
+    def solve(self, connectivity='reach', time_limit=None):
+        # connectivity 'reach' gives every island a distance to the first one, 'flow' sends a unit of flow from the
+        # first island to every other one, 'lazy' solves without connectivity and adds the cuts violated by each
+        # solution found (see connectivity_cuts), starting the next solve from it.
+        # Returns None if there is no solution, raises TimeoutError if that was not settled within time_limit seconds
+        if not self.consistent:
+            return None
+        self.constraints(connectivity)
+        return self.search(connectivity, time_limit)
+
+    def search(self, connectivity='reach', time_limit=None):
+        # Solves the model built by constraints(connectivity), see solve
         solver = cp_model.CpSolver()
-        status = solver.Solve(self.model)
-        if status == cp_model.OPTIMAL:
-            # return all the nodes
-            # and their edges
-            # and their neighbors
-            # and their values
-            nodes_info = {}
+        deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        while True:
+            if deadline is not None:
+                solver.parameters.max_time_in_seconds = max(0.0, deadline - time.perf_counter())
+            status = solver.Solve(self.model)
+            if status == cp_model.UNKNOWN and deadline is not None:
+                raise TimeoutError(f'No Hashiwokakero solution within {time_limit} seconds')
+            if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+                return None
+            drawn = {bridge: solver.BooleanValue(used) for bridge, used in self.used.items()}
+            if connectivity != 'lazy' or not self.connectivity_cuts(drawn):
+                break
+            self.model.ClearHints()
             for node in self.nodes:
-                nodes_info[node.index] = {
-                    'value': node.value,
-                    'edges': {neighbor.index: solver.Value(node.edges[neighbor.index]) for neighbor in node.neighbors},
-                    'neighbors': [neighbor.index for neighbor in node.neighbors],
-                }
-            return nodes_info
-        else:
-            return None
+                for neighbor in node.neighbors:
+                    if node.index < neighbor.index:
+                        self.model.AddHint(node.edges[neighbor.index], solver.Value(node.edges[neighbor.index]))
+        # return all the nodes
+        # and their edges
+        # and their neighbors
+        # and their values
+        nodes_info = {}
+        for node in self.nodes:
+            nodes_info[node.index] = {
+                'value': node.value,
+                'edges': {neighbor.index: solver.Value(node.edges[neighbor.index]) for neighbor in node.neighbors},
+                'neighbors': [neighbor.index for neighbor in node.neighbors],
+            }
+        return nodes_info
 
     def print(self):
         result = self.solve()
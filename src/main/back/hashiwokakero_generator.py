@@ -0,0 +1,162 @@
+import random
+
+from hashiwokakero import Hashiwokakero
+
+
+class HashiwokakeroGenerator:
+    """
+    Generates Hashiwokakero puzzles with a unique solution.
+    Islands are placed as a random spanning tree: a new island is put in line with an island already on the board,
+    at a free cell reached without passing another island or a bridge and next to no other island, and joined to
+    it by one or two bridges. Pairs of islands facing each other with no bridge between them are then joined too,
+    each with probability extra_rate, which closes cycles. Islands count the bridges they end up with.
+    The clue board is then searched for a solution other than the intended one (deduction alone often settles it,
+    otherwise the lazy model is solved with the intended bridges blocked, stopping at the first solution).
+    When there is one, a bridge that it changes is made more telling: a single bridge becomes double, or a pair of
+    islands it joins where the intended solution does not gets a bridge, and the board is checked again.
+    """
+
+    EXTRA_RATE = 0.3  # probability of joining two facing islands after the spanning tree
+    REPAIRS = 20  # bridges changed before new islands are placed
+    CHECK_TIME = 1.0  # seconds
+    ATTEMPTS = 100  # spanning trees placed before giving up
+
+    def __init__(self, n, seed=None, islands=None, extra_rate=EXTRA_RATE):
+        self.n = n
+        self.islands = islands if islands is not None else n * n // 5
+        if n < 3 or self.islands < 3:
+            raise ValueError(f'At least 3 islands on a 3x3 board are needed, got {self.islands} on {n}x{n}')
+        self.extra_rate = extra_rate
+        self.random = random.Random(seed)
+
+    def between(self, a, b):
+        # Cells strictly between two islands in line (a before b)
+        step = 1 if a // self.n == b // self.n else self.n
+        return range(a + step, b, step)
+
+    def tree(self):
+        # Values of the islands of a random spanning tree, and its bridges {(a, b): count} with a < b.
+        # Stops early when no island fits after many tries
+        grid = [0] * (self.n * self.n)
+        bridges = {}
+        covered = set()
+        placed = [self.random.randrange(self.n * self.n)]
+        for _ in range(100 * self.islands):
+            if len(placed) == self.islands:
+                break
+            start = self.random.choice(placed)
+            dr, dc = self.random.choice(((-1, 0), (1, 0), (0, -1), (0, 1)))
+            r, c = divmod(start, self.n)
+            length = self.random.randint(2, max(2, self.n // 4))
+            er, ec = r + length * dr, c + length * dc
+            if not (0 <= er < self.n and 0 <= ec < self.n):
+                continue
+            end = er * self.n + ec
+            pair = (min(start, end), max(start, end))
+            if grid[end] or end in covered or any(grid[idx] or idx in covered for idx in self.between(*pair)):
+                continue
+            around = [(er + ar) * self.n + ec + ac for ar, ac in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                      if 0 <= er + ar < self.n and 0 <= ec + ac < self.n]
+            if any(grid[idx] or idx == start for idx in around):
+                continue
+            self.join(grid, bridges, pair, self.random.randint(1, 2))
+            covered.update(self.between(*pair))
+            placed.append(end)
+        return grid, bridges
+
+    def covered(self, bridges):
+        # Cells under a bridge
+        return {idx for pair, count in bridges.items() if count for idx in self.between(*pair)}
+
+    def join(self, grid, bridges, pair, count):
+        # Sets the number of bridges between a pair of islands, updating their values
+        a, b = pair
+        added = count - bridges.get(pair, 0)
+        grid[a] += added
+        grid[b] += added
+        bridges[pair] = count
+
+    def rows(self, grid):
+        return [grid[i:i + self.n] for i in range(0, self.n * self.n, self.n)]
+
+    def extra(self, grid, bridges):
+        # Joins facing islands that nothing separates, each with probability extra_rate
+        hashiwokakero = Hashiwokakero(self.rows(grid), deduce=False)
+        covered = self.covered(bridges)
+        pairs = sorted(hashiwokakero.bounds)
+        self.random.shuffle(pairs)
+        for pair in pairs:
+            if pair not in bridges and self.random.random() < self.extra_rate and \
+                    covered.isdisjoint(self.between(*pair)):
+                self.join(grid, bridges, pair, self.random.randint(1, 2))
+                covered.update(self.between(*pair))
+
+    def other_solution(self, rows, bridges):
+        # Bridges {(a, b): count} of a solution of the clue board other than bridges, None if there is none.
+        # Raises TimeoutError if the search takes more than CHECK_TIME
+        hashiwokakero = Hashiwokakero(rows)
+        if not hashiwokakero.consistent:
+            raise ValueError('The intended solution does not solve its own clues')
+        if hashiwokakero.resolved == 1:  # deduction fixed every bridge
+            return None
+        hashiwokakero.constraints('lazy')
+        model = hashiwokakero.model
+        differs = []
+        for (a, b), used in hashiwokakero.used.items():
+            edge = hashiwokakero.nodes_dict[a].edges[b]
+            differ = model.new_bool_var(f'differ_{a}_{b}')
+            model.add(edge != bridges.get((a, b), 0)).OnlyEnforceIf(differ)
+            differs.append(differ)
+        model.AddBoolOr(differs)
+        sol = hashiwokakero.search('lazy', self.CHECK_TIME)
+        if sol is None:
+            return None
+        return {(a, b): sol[a]['edges'][b] for a, b in hashiwokakero.bounds}
+
+    def repair(self, grid, bridges, other):
+        # Makes a bridge that other changes more telling, False if none can be
+        covered = self.covered(bridges)
+        doubled = [pair for pair, count in bridges.items() if count == 1 and other[pair] != 1]
+        drawn = [pair for pair, count in other.items() if count and not bridges.get(pair) and
+                 covered.isdisjoint(self.between(*pair))]
+        options = doubled or drawn
+        if not options:
+            return False
+        pair = self.random.choice(options)
+        self.join(grid, bridges, pair, 2 if pair in bridges else other[pair])
+        return True
+
+    def solution(self, rows, bridges):
+        # The bridges as Hashiwokakero.solve gives them
+        hashiwokakero = Hashiwokakero(rows, deduce=False)
+        return {node.index: {
+            'value': node.value,
+            'edges': {neighbor.index: bridges.get(hashiwokakero.bridge(node, neighbor), 0)
+                      for neighbor in node.neighbors},
+            'neighbors': [neighbor.index for neighbor in node.neighbors],
+        } for node in hashiwokakero.nodes}
+
+    def puzzle(self):
+        # Returns the rows of the clue board and its solution, as Hashiwokakero.solve gives it.
+        # Raises RuntimeError if none of ATTEMPTS spanning trees gives a unique puzzle
+        for _ in range(self.ATTEMPTS):
+            grid, bridges = self.tree()
+            if len(bridges) < 2:
+                continue
+            self.extra(grid, bridges)
+            for _ in range(self.REPAIRS):
+                rows = self.rows(grid)
+                try:
+                    other = self.other_solution(rows, bridges)
+                except TimeoutError:
+                    break
+                if other is None:
+                    return rows, self.solution(rows, bridges)
+                if not self.repair(grid, bridges, other):
+                    break
+        raise RuntimeError(f'No unique puzzle found in {self.ATTEMPTS} attempts')
+
+    def puzzles(self, count):
+        # Yields count puzzles, for filling a puzzle pool in bulk
+        for _ in range(count):
+            yield self.puzzle()
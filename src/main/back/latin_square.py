@@ -0,0 +1,63 @@
+from ortools.sat.python import cp_model
+from puzzle import Puzzle
+
+_UNITS = {}
+_SKELETONS = {}
+
+
+def get_units(n, box=None):
+    # Cell indexes of the rows, columns and boxes (none without a box size) of an n x n grid, computed once per size
+    key = (n, box)
+    if key not in _UNITS:
+        rows = tuple(tuple(range(r * n, (r + 1) * n)) for r in range(n))
+        cols = tuple(tuple(range(c, n * n, n)) for c in range(n))
+        boxes = ()
+        if box:
+            boxes = tuple(tuple((br * box + i) * n + bc * box + j for i in range(box) for j in range(box))
+                          for br in range(n // box) for bc in range(n // box))
+        _UNITS[key] = (rows, cols, boxes)
+    return _UNITS[key]
+
+
+def get_skeleton(n, box=None):
+    # Model with the n * n cell variables in 1..n and an AllDifferent per unit, built once per size
+    key = (n, box)
+    if key not in _SKELETONS:
+        model = cp_model.CpModel()
+        cells = [model.new_int_var(1, n, 'x[%i]' % i) for i in range(n * n)]
+        rows, cols, boxes = get_units(n, box)
+        for unit in rows + cols + boxes:
+            model.add_all_different([cells[i] for i in unit])
+        _SKELETONS[key] = model
+    return _SKELETONS[key]
+
+
+class LatinSquare(Puzzle):
+    """
+    Base of the puzzles whose solution is a Latin square: every value once in every row and column,
+    and in every box when box is given (Sudoku).
+    The unit index tables and the model holding the AllDifferent constraints are shared by every grid of
+    the same size: a new puzzle clones that model and only narrows the domains of its cells.
+    """
+
+    def __init__(self, n, rows, box=None):
+        super().__init__(n, rows)
+        self.box = box
+        self.rows, self.cols, self.boxes = get_units(n, box)
+        self.model = None
+        self.grid_expr = None
+
+    def units(self):
+        return self.rows + self.cols + self.boxes
+
+    def get_boxes(self, grid):
+        # Returns a grid's boxes as a list of boxes, left to right then top to bottom.
+        return [[grid[i] for i in unit] for unit in self.boxes]
+
+    def new_model(self, domains):
+        # Clones the shared model, the cell i keeping only the values of the cp_model.Domain domains[i]
+        self.model = get_skeleton(self.n, self.box).clone()
+        variables = self.model.Proto().variables
+        for i, domain in enumerate(domains):
+            variables[i].domain[:] = domain.flattened_intervals()
+        self.grid_expr = [self.model.get_int_var_from_proto_index(i) for i in range(self.n * self.n)]
@@ -1,9 +1,17 @@
 from futoshiki import Futoshiki
+from futoshiki_generator import get_generator
 from hashiwokakero import Hashiwokakero
+from hashiwokakero_generator import HashiwokakeroGenerator
 from numberlink import Numberlink
+from numberlink_generator import NumberlinkGenerator
 from nurikabe import Nurikabe
+from nurikabe_generator import NurikabeGenerator
+from puzzle_pool import PuzzlePool
 from shikaku import Shikaku
+from shikaku_generator import ShikakuGenerator
+from solver_pool import PoolFull, SolverPool
 from sudoku import Sudoku
+from sudoku_grader import LEVELS
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
@@ -42,12 +50,20 @@ def solve_puzzle():
     constraints = data.get('constraints')
 
     try:
-        solution = call_puzzle_solver(puzzle, grid, constraints)
+        solution = solver_pool.solve(puzzle, grid, constraints)
         return jsonify({"solution": solution})
+    except PoolFull as e:
+        return jsonify({"error": str(e)}), 503
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 
+# Seconds given to CP-SAT on a Numberlink board the native router gave up on, within the solver pool's timeout
+NUMBERLINK_TIME = 20
+
+
 def call_puzzle_solver(puzzle, grid, constraints=None):
     match puzzle:
         case "futoshiki":
@@ -84,7 +100,7 @@ def call_puzzle_solver(puzzle, grid, constraints=None):
             except Exception as e:
                 print(f"Error constructing Numberlink: {e}")
                 raise
-            result = numberlink.solve()
+            result = numberlink.solve('edges', time_limit=NUMBERLINK_TIME, native=True)
             if result:
                 return numberlink.get_rows(result)
             else:
@@ -136,128 +152,83 @@ def generate_puzzle():
         return '', 200
 
     data = request.get_json()
-    puzzle = data.get('type')
-    size = data.get('size')
-    constraints = data.get('constraints')
     try:
-        generated_puzzle = call_puzzle_generator(puzzle, size, constraints)
+        generated_puzzle = puzzle_pool.get(*pool_key(data.get('type'), data.get('size'), data.get('difficulty')))
         return jsonify({"puzzle": generated_puzzle})
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 
-def call_puzzle_generator(puzzle, size, constraints=None):
+# Sizes generated for every puzzle type; larger boards take too long to generate on request
+GENERATED_SIZES = {
+    "futoshiki": range(4, 10),
+    "hashiwokakero": range(5, 16),
+    "numberlink": range(5, 13),
+    "nurikabe": range(5, 11),
+    "shikaku": range(5, 21),
+    "sudoku": (4, 9),
+}
+DEFAULT_SIZES = {"futoshiki": 7, "hashiwokakero": 7, "numberlink": 7, "nurikabe": 7, "shikaku": 10, "sudoku": 9}
+
+
+def pool_key(puzzle, size, difficulty):
+    # The (type, size, difficulty) puzzle pool key of a request, checked against the generated types and sizes.
+    # Only Sudoku has difficulties, other types share one pool whatever difficulty is asked for
+    if puzzle not in GENERATED_SIZES:
+        raise Exception("Invalid puzzle type")
+    size = DEFAULT_SIZES[puzzle] if size is None else int(size)
+    if size not in GENERATED_SIZES[puzzle]:
+        raise Exception(f"Unsupported size {size} for {puzzle}, expected one of "
+                        f"{', '.join(map(str, GENERATED_SIZES[puzzle]))}")
+    if puzzle != "sudoku":
+        difficulty = None
+    elif difficulty is not None and difficulty not in LEVELS:
+        raise Exception(f"Unknown difficulty {difficulty}, expected one of {', '.join(LEVELS)}")
+    return puzzle, size, difficulty
+
+
+def call_puzzle_generator(puzzle, size, constraints=None, difficulty=None):
     match puzzle:
         case "futoshiki":
-            k = 3  # Number of constraints to generate
-            import random
-            grid = [[0 for _ in range(size)] for _ in range(size)]
-            row, col = random.randint(0, size - 1), random.randint(0, size - 1)
-            grid[row][col] = random.randint(1, size)
-            # Generate random constraints
-            futoshiki = Futoshiki(grid, [])
-            result = futoshiki.solve()
-            if result:
-                result = futoshiki.get_rows(result)
-            else:
-                raise Exception("Failed to generate a valid Futoshiki puzzle.")
-            # Add constraints from result
+            size = size or 7
+            grid, ineqs = get_generator(size).puzzle()
+            # Front-end format: (key, ineq, a, b, isHorizontal), the key naming the top-left cell of the pair
             constraints = []
-            for _ in range(k):
-                row, col = random.randint(0, size - 1), random.randint(0, size - 1)
-                horizontal = random.choice([True, False])
-                new_col_1 = 0
-                new_col_2 = 0
-                new_row_1 = 0
-                new_row_2 = 0
-                if horizontal:
-                    new_col = 0
-                    if col < size - 1:
-                        ineq = ""
-                        new_col = col + 1
-                        if result[row][col] < result[row][new_col]:
-                            ineq = '<'
-                        else:
-                            ineq = '>'
-                    else:
-                        ineq = ''
-                        new_col = col - 1
-                        if result[row][col - 1] < result[row][col]:
-                            ineq = '<'
-                        else:
-                            ineq = '>'
-                    new_col_1 = min(col, new_col)
-                    new_col_2 = max(col, new_col)
-                    isHorizontal = True
-                    key = f"h-{row}-{new_col_1}"
-                    constraint = (key, ineq, row * size + new_col_1, row * size + new_col_2, isHorizontal)
-                    if constraint not in constraints:
-                        constraints.append(constraint)
-                else:
-                    new_row = 0
-                    if row < size - 1:
-                        ineq = ""
-                        new_row = row + 1
-                        if result[row][col] < result[new_row][col]:
-                            ineq = '<'
-                        else:
-                            ineq = '>'
-                    else:
-                        ineq = ''
-                        new_row = row - 1
-                        if result[row - 1][col] < result[row][col]:
-                            ineq = '<'
-                        else:
-                            ineq = '>'
-                    new_row_1 = min(row, new_row)
-                    new_row_2 = max(row, new_row)
-                    isHorizontal = False
-                    key = f"v-{new_row_1}-{col}"
-                    constraint = (key, ineq, new_row_1 * size + col, new_row_2 * size + col, isHorizontal)
-                    if constraint not in constraints:
-                        constraints.append(constraint)
+            for ineq, a, b in ineqs:
+                isHorizontal = b == a + 1
+                key = f"{'h' if isHorizontal else 'v'}-{a // size}-{a % size}"
+                constraints.append((key, ineq, a, b, isHorizontal))
             return {"grid": grid, "constraints": constraints}
         case "hashiwokakero":
-            pass
+            rows, _ = HashiwokakeroGenerator(size or 7).puzzle()
+            return rows
         case "numberlink":
-            pass
+            rows, _ = NumberlinkGenerator(size or 7).puzzle()
+            return rows
         case "nurikabe":
-            pass
+            rows, _ = NurikabeGenerator(size or 7).puzzle()
+            return rows
         case "shikaku":
-            pass
+            rows, _ = ShikakuGenerator(size or 10).puzzle()
+            return rows
         case "sudoku":
-            k = 40  # Number of cells to remove for the puzzle
-            import random
-            grid = [0 for _ in range(81)]
-            col_indexes = [0, 1, 2, 3, 4, 5, 6, 7, 8]
-            numbers = [1, 2, 3, 4, 5, 6, 7, 8, 9]
-            for i in range(9):
-                random.shuffle(col_indexes)
-                random.shuffle(numbers)
-                col = col_indexes.pop()
-                number = numbers.pop()
-                grid[i * 9 + col] = number
-            grid = [[x for x in grid[i:i + 9]] for i in range(0, 81, 9)]
-            print(grid)
-            s = Sudoku(grid)
-            grid = s.solve()
-            if grid:
-                grid = [[grid[i * 9 + j] for j in range(9)] for i in range(9)]
-                # Remove k numbers from the grid to create a puzzle
-                for _ in range(k):
-                    i = random.randint(0, 8)
-                    j = random.randint(0, 8)
-                    while grid[i][j] == 0:
-                        i = random.randint(0, 8)
-                        j = random.randint(0, 8)
-                    grid[i][j] = 0
-                return grid
-            else:
-                raise Exception("Failed to generate a valid Sudoku puzzle.")
+            size = size or 9
+            # Ungraded puzzles stop at 5/8 of the cells dug (50 on 9x9), a few times faster to generate than a
+            # minimal puzzle; graded ones are dug as far as their grade allows
+            holes = None if difficulty else size * size * 5 // 8
+            return Sudoku.generate(size, holes=holes, difficulty=difficulty)
 
         case _:
             raise Exception("Invalid puzzle type")
 
 
+# Ready-made puzzles, so that /api/generate does not have to generate them inside the request
+puzzle_pool = PuzzlePool(call_puzzle_generator)
+# Worker processes running call_puzzle_solver for /api/solve, off the request threads
+solver_pool = SolverPool(call_puzzle_solver)
+
+
 if __name__ == '__main__':
+    puzzle_pool.warm([("sudoku", 9, None)])
+    solver_pool.start()
     app.run(debug=True, port=5000)
@@ -1,9 +1,18 @@
 from ortools.sat.python import cp_model
+from numberlink_router import NumberlinkRouter
 from puzzle import Puzzle
 
 
+FORMULATIONS = ['reach', 'edges']
+
+
 class Numberlink(Puzzle):
-    def __init__(self, rows):
+    ROUTER_TIME = 1.0  # seconds given to the native router before the CP-SAT model is built
+
+    def __init__(self, rows, propagate=True):
+        # With propagate, the links and colours forced by the endpoints are found up front (see propagate). They
+        # follow the rules of the edge formulation, one unbranched path per colour through every cell, so only
+        # edge_constraints fixes them: the reach formulation allows other solutions
         super().__init__(len(rows[0]), rows)
         try:
             assert len(self.grid) == self.n * self.n
@@ -15,21 +24,35 @@ class Numberlink(Puzzle):
         # the total count of numbers (i.e. including duplicates) is even by definition of the puzzle
         self.grid_expr = []
         self.paths = []
-        current = 0
+        # Path index of every cell when known (the endpoints to begin with)
+        self.colours = [None] * len(self.grid)
         nb_set = {}
+        paired = True  # no number appears more than twice
         for i in range(len(self.grid)):
-            if self.grid[i] == 0:
-                self.grid_expr.append(self.model.new_int_var(0, self.DOMAIN, f'x[{i}]'))
-            else:
+            if self.grid[i] != 0:
                 if self.grid[i] not in nb_set.keys():
-                    self.grid_expr.append(self.model.new_int_var(current, current, f'x[{i}]'))
-                    self.paths.append(self.Path(current, i, self.grid[i]))
-                    nb_set[self.grid[i]] = current
-                    current += 1
+                    self.paths.append(self.Path(len(self.paths), i, self.grid[i]))
+                    nb_set[self.grid[i]] = len(self.paths) - 1
                 else:
                     path = self.paths[nb_set[self.grid[i]]]
+                    paired = paired and path.end is None
                     path.end = i
-                    self.grid_expr.append(self.model.new_int_var(path.index, path.index, f'x[{i}]'))
+                self.colours[i] = nb_set[self.grid[i]]
+        # Pairs of adjacent cells that propagation linked, and the fraction of cells whose path it found
+        self.links = set()
+        self.resolved = 0.0
+        for i in range(len(self.grid)):
+            if self.colours[i] is None:
+                self.grid_expr.append(self.model.new_int_var(0, self.DOMAIN, f'x[{i}]'))
+            else:
+                self.grid_expr.append(self.model.new_int_var(self.colours[i], self.colours[i], f'x[{i}]'))
+        # A number that does not appear exactly twice is no path: there is no solution, whatever the formulation.
+        # consistent is also False when propagation meets a dead end, which only rules out the edge formulation
+        self.paired = paired and all(path.end is not None for path in self.paths)
+        self.consistent = self.paired
+        if propagate and self.consistent:
+            self.resolved = self.propagate()
+            self.consistent = self.resolved is not None
 
     class Path:
         def __init__(self, index, start, value):
@@ -53,6 +76,59 @@ class Numberlink(Puzzle):
             neighbors.append(r * self.n + c + 1)
         return neighbors
 
+    def propagate(self):
+        # Forced moves: a cell is linked to two neighbours on its path, an endpoint to one, so a cell with only as
+        # many possible links as it still needs takes them all (a corner next to an endpoint, a cell with a single
+        # free neighbour left...). A link joins cells of the same path and never closes a loop, so the paths
+        # grow from the endpoints along forced moves, and cells linked together share their colour.
+        # A cell left with too few possible links is a dead end: returns None, the edge formulation has no solution.
+        # Otherwise sets self.links and self.colours and returns the fraction of cells whose path is known.
+        # Two endpoints of a path next to each other are not linked: the path may go round other cells instead
+        size = len(self.grid)
+        endpoints = {path.start for path in self.paths} | {path.end for path in self.paths}
+        needed = [1 if idx in endpoints else 2 for idx in range(size)]
+        parent = list(range(size))  # linked cells, as a union-find forest
+        colour = {idx: c for idx, c in enumerate(self.colours) if c is not None}  # by root
+        links = set()
+
+        def find(idx):
+            while parent[idx] != idx:
+                parent[idx] = parent[parent[idx]]
+                idx = parent[idx]
+            return idx
+
+        def linkable(idx, neighbor):
+            if needed[neighbor] == 0 or (min(idx, neighbor), max(idx, neighbor)) in links:
+                return False
+            a, b = find(idx), find(neighbor)
+            return a != b and (a not in colour or b not in colour or colour[a] == colour[b])
+
+        changed = True
+        while changed:
+            changed = False
+            for idx in range(size):
+                if needed[idx] == 0:
+                    continue
+                options = [neighbor for neighbor in self.get_neighbors(idx) if linkable(idx, neighbor)]
+                if len(options) < needed[idx]:
+                    return None
+                if len(options) > needed[idx]:
+                    continue
+                for neighbor in options:
+                    if not linkable(idx, neighbor):  # the other forced link closed a loop or mixed two paths
+                        return None
+                    links.add((min(idx, neighbor), max(idx, neighbor)))
+                    needed[idx] -= 1
+                    needed[neighbor] -= 1
+                    a, b = find(idx), find(neighbor)
+                    parent[b] = a
+                    if b in colour:
+                        colour[a] = colour.pop(b)
+                changed = True
+        self.links = links
+        self.colours = [colour.get(find(idx)) for idx in range(size)]
+        return sum(c is not None for c in self.colours) / size
+
     def constraints(self):
         # like Nurikabe but there is no sea and the paths do not have to be orthogonally separated
         # however, it must link the two cells with the same number
@@ -116,9 +192,60 @@ class Numberlink(Puzzle):
                             OnlyEnforceIf(cell_in_path[cell_idx][path.index])
         return reach
 
-    def solve(self):
-        reach = self.constraints()
+    def edge_constraints(self):
+        # Paths as boolean arcs between adjacent cells, an arc joining two cells of the same colour.
+        # A fixed arc from the end of every path to the start of the next one chains the paths into a single
+        # circuit through all the cells, so that AddCircuit gives every cell exactly one arc in and one out
+        # (endpoints get a single arc on the board, next to their fixed one) and rules out any cycle apart
+        # from the paths. The model only grows with the number of cells, not with the number of colours
+        starts = {path.start for path in self.paths}
+        ends = {path.end for path in self.paths}
+        arcs = {}
+        for idx in range(len(self.grid)):
+            if idx in ends:
+                continue
+            for neighbor in self.get_neighbors(idx):
+                if neighbor in starts:
+                    continue
+                arc = self.model.new_bool_var(f'arc[{idx}][{neighbor}]')
+                self.model.Add(self.grid_expr[idx] == self.grid_expr[neighbor]).OnlyEnforceIf(arc)
+                arcs[idx, neighbor] = arc
+        for a, b in self.links:
+            self.model.AddExactlyOne([arcs[pair] for pair in ((a, b), (b, a)) if pair in arcs])
+        for idx, colour in enumerate(self.colours):
+            if colour is not None:
+                self.model.Add(self.grid_expr[idx] == colour)
+        circuit = [(idx, neighbor, arc) for (idx, neighbor), arc in arcs.items()]
+        for path, following in zip(self.paths, self.paths[1:] + self.paths[:1]):
+            circuit.append((path.end, following.start, self.model.new_constant(1)))
+        self.model.AddCircuit(circuit)
+        return arcs
+
+    def solve(self, formulation='reach', time_limit=None, native=False):
+        # formulation 'reach' gives every path reach variables decreasing towards its start,
+        # 'edges' links the cells with arcs (see edge_constraints).
+        # They do not solve the same puzzle. 'edges' asks for one unbranched path per colour through every cell,
+        # the usual rules; 'reach' puts every cell on a path too, but lets a path branch and forbids an endpoint
+        # to touch more than one cell of its path. Each accepts boards that the other rejects.
+        # With native, the native router is tried for ROUTER_TIME seconds before the 'edges' model is built: it
+        # solves most open boards in that time and follows the same rules. The 'reach' formulation never uses it.
+        # Returns None if there is no solution, or none was found within time_limit seconds
+        assert formulation in FORMULATIONS, \
+            f'Unknown formulation {formulation}, expected one of {", ".join(FORMULATIONS)}'
+        if not (self.consistent if formulation == 'edges' else self.paired):
+            return None
+        if native and formulation == 'edges':
+            router = NumberlinkRouter(self.n, [(path.start, path.end) for path in self.paths])
+            solution = router.route(self.ROUTER_TIME)
+            if solution is not None:
+                return solution
+        if formulation == 'edges':
+            self.edge_constraints()
+        else:
+            self.constraints()
         solver = cp_model.CpSolver()
+        if time_limit is not None:
+            solver.parameters.max_time_in_seconds = time_limit
         status = solver.Solve(self.model)
         if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
             return [solver.Value(x) for x in self.grid_expr]
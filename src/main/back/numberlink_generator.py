@@ -0,0 +1,141 @@
+import random
+
+from ortools.sat.python import cp_model
+
+from numberlink import Numberlink
+
+
+class NumberlinkGenerator:
+    """
+    Generates Numberlink puzzles whose paths cover the whole board, with a unique solution.
+    A random Hamiltonian path of the board is cut into paths of 3 to max_length cells, and only their endpoints
+    are kept as clues. The Hamiltonian path starts as a snake through the rows and is shuffled by backbite moves:
+    one end steps to a random neighbour, and the part of the path between them is reversed.
+    The clue board is then searched for a solution using a link between two cells that the intended one does not
+    (edge model, stopping at the first one). When there is one, a path that it routes differently is cut in two
+    at a cell where they differ, which adds a pair of clues, and the board is checked again.
+    Once unique, consecutive paths are joined back as long as the puzzle stays unique, for fewer and longer paths.
+    """
+
+    SHUFFLES = 10  # backbite moves per cell
+    REPAIRS = 30  # paths cut before a new Hamiltonian path is drawn
+    CHECK_TIME = 2.0  # seconds
+
+    def __init__(self, n, seed=None, max_length=None):
+        self.n = n
+        self.max_length = max_length if max_length is not None else n
+        self.random = random.Random(seed)
+        self.neighbors = []
+        for idx in range(n * n):
+            r, c = idx // n, idx % n
+            self.neighbors.append([(r + dr) * n + c + dc for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                                   if 0 <= r + dr < n and 0 <= c + dc < n])
+
+    def hamiltonian_path(self):
+        path = [r * self.n + (c if r % 2 == 0 else self.n - 1 - c) for r in range(self.n) for c in range(self.n)]
+        for _ in range(self.SHUFFLES * self.n * self.n):
+            if self.random.random() < 0.5:
+                path.reverse()
+            i = path.index(self.random.choice(self.neighbors[path[0]]))
+            if i > 1:
+                path[:i] = path[i - 1::-1]
+        return path
+
+    def split(self, path):
+        # Consecutive pieces of at most max_length cells. A piece also ends before a cell that touches one of its
+        # cells other than the previous one: a path running next to itself can almost always be rerouted through
+        # the same cells, which makes the puzzle ambiguous. Pieces are kept at least 3 cells long, so a piece may
+        # still touch itself (the repairs then deal with it)
+        segments = []
+        segment = []
+        length = 0
+        for idx in path:
+            touches = any(neighbor in segment[:-1] for neighbor in self.neighbors[idx])
+            if segment and (len(segment) == length or touches and len(segment) >= 3):
+                segments.append(segment)
+                segment = []
+            if not segment:
+                length = self.random.randint(3, max(3, self.max_length))
+            segment.append(idx)
+        if len(segment) < 3 and segments:
+            segments[-1] += segment
+        else:
+            segments.append(segment)
+        return segments
+
+    def board(self, segments):
+        # Clue rows and the intended solution, paths numbered like Numberlink does: by their first endpoint,
+        # row by row
+        segments = sorted(segments, key=lambda segment: min(segment[0], segment[-1]))
+        grid = [0] * (self.n * self.n)
+        solution = [0] * (self.n * self.n)
+        for index, segment in enumerate(segments):
+            grid[segment[0]] = grid[segment[-1]] = index + 1
+            for idx in segment:
+                solution[idx] = index
+        return [grid[i:i + self.n] for i in range(0, self.n * self.n, self.n)], solution
+
+    def other_solution(self, rows, segments):
+        # Path index of every cell in a solution linking some cells that segments do not, None if there is none.
+        # Raises TimeoutError if the search takes more than CHECK_TIME
+        numberlink = Numberlink(rows)
+        if not numberlink.consistent:
+            raise ValueError('The intended solution does not solve its own clues')
+        links = {(min(a, b), max(a, b)) for segment in segments for a, b in zip(segment, segment[1:])}
+        if numberlink.links == links:  # propagation forced every link
+            return None
+        arcs = numberlink.edge_constraints()
+        numberlink.model.AddBoolOr([arc for (a, b), arc in arcs.items() if (min(a, b), max(a, b)) not in links])
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = self.CHECK_TIME
+        status = solver.Solve(numberlink.model)
+        if status == cp_model.INFEASIBLE:
+            return None
+        if status == cp_model.UNKNOWN:
+            raise TimeoutError(f'Uniqueness not settled within {self.CHECK_TIME} seconds')
+        return [solver.Value(x) for x in numberlink.grid_expr]
+
+    def unique(self, segments):
+        # Whether the clues of segments only have them as solution, False when that could not be settled in time
+        try:
+            return self.other_solution(self.board(segments)[0], segments) is None
+        except TimeoutError:
+            return False
+
+    def merge(self, segments):
+        # Joins consecutive paths of the Hamiltonian path as long as the puzzle stays unique, for fewer clues.
+        # Pairs are tried in random order (positions shift as paths are joined, the last ones are then skipped)
+        for i in self.random.sample(range(len(segments) - 1), len(segments) - 1):
+            if i + 1 >= len(segments):
+                continue
+            merged = segments[:i] + [segments[i] + segments[i + 1]] + segments[i + 2:]
+            if len(merged[i]) <= self.max_length and self.unique(merged):
+                segments = merged
+        return segments
+
+    def puzzle(self):
+        # Returns the rows of the clue board and its solution, as Numberlink.solve gives it
+        while True:
+            segments = self.split(self.hamiltonian_path())
+            for _ in range(self.REPAIRS):
+                rows, solution = self.board(segments)
+                try:
+                    other = self.other_solution(rows, segments)
+                except TimeoutError:
+                    break
+                if other is None:
+                    return self.board(self.merge(segments))
+                # cut a path that the other solution changes, at a cell it gives to another path if possible
+                cuts = [(k, i) for k, segment in enumerate(segments) for i in range(3, len(segment) - 2)
+                        if other[segment[i]] != solution[segment[i]]]
+                cuts = cuts or [(k, i) for k, segment in enumerate(segments) for i in range(3, len(segment) - 2)
+                                if any(other[idx] != solution[idx] for idx in segment)]
+                if not cuts:
+                    break
+                k, i = self.random.choice(cuts)
+                segments[k:k + 1] = [segments[k][:i], segments[k][i:]]
+
+    def puzzles(self, count):
+        # Yields count puzzles, for filling a puzzle pool in bulk
+        for _ in range(count):
+            yield self.puzzle()
@@ -0,0 +1,187 @@
+import heapq
+import random
+import time
+
+
+class NumberlinkRouter:
+    """
+    Native heuristic Numberlink solver.
+    Every path is first routed along a cheapest way between its endpoints, never through another path's endpoint.
+    Paths may share cells at first: after each round the shared cells get more expensive and every path is ripped
+    up and rerouted in turn (negotiated congestion), until no cell is shared.
+    The cells left over are then handed to the paths: two free cells side by side along a path are inserted in it
+    as a detour, and a path next to a free region is rerouted through its own cells and that region along a
+    longest path found by a bounded depth-first search (which may also move the free cells elsewhere).
+    This finds a solution of most open boards far faster than building a CP-SAT model, but it can give up on
+    boards that have one: None then only means that the time budget ran out.
+    """
+
+    ROUNDS = 30  # rerouting rounds before the paths are routed again in another order
+    DETOUR_NODES = 300  # nodes of the longest path search for a single region
+
+    def __init__(self, n, endpoints, seed=0):
+        # endpoints: (start, end) of every path, a path is labelled by its index in it
+        self.n = n
+        self.endpoints = endpoints
+        self.random = random.Random(seed)
+        self.neighbors = []
+        for idx in range(n * n):
+            r, c = idx // n, idx % n
+            self.neighbors.append([(r + dr) * n + c + dc for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                                   if 0 <= r + dr < n and 0 <= c + dc < n])
+        self.endpoint_of = {}
+        for k, (start, end) in enumerate(endpoints):
+            self.endpoint_of[start] = self.endpoint_of[end] = k
+
+    def shortest(self, k, usage, history, pressure):
+        # Cheapest route of path k, a cell costing more the more it was shared and the more paths use it now
+        start, end = self.endpoints[k]
+        dist = {start: 0}
+        previous = {}
+        heap = [(0, start)]
+        while heap:
+            d, idx = heapq.heappop(heap)
+            if idx == end:
+                break
+            if d > dist[idx]:
+                continue
+            for neighbor in self.neighbors[idx]:
+                if self.endpoint_of.get(neighbor, k) != k:
+                    continue
+                cost = d + (1 + history[neighbor]) * (1 + pressure * usage[neighbor])
+                if cost < dist.get(neighbor, float('inf')):
+                    dist[neighbor] = cost
+                    previous[neighbor] = idx
+                    heapq.heappush(heap, (cost, neighbor))
+        if end not in dist:
+            return None
+        route = [end]
+        while route[-1] != start:
+            route.append(previous[route[-1]])
+        return route[::-1]
+
+    def negotiate(self, order):
+        # Routes of all paths sharing no cell, {path: cells from start to end}, None if the rounds run out
+        size = self.n * self.n
+        usage = [0] * size
+        history = [0] * size
+        routes = {}
+        for round_ in range(self.ROUNDS):
+            pressure = 0.5 * 1.5 ** round_
+            for k in order:
+                for idx in routes.get(k, ()):
+                    usage[idx] -= 1
+                routes[k] = self.shortest(k, usage, history, pressure)
+                if routes[k] is None:  # walled in by endpoints
+                    return None
+                for idx in routes[k]:
+                    usage[idx] += 1
+            shared = [idx for idx in range(size) if usage[idx] > 1]
+            if not shared:
+                return routes
+            for idx in shared:
+                history[idx] += 1
+        return None
+
+    def insert_pairs(self, routes, owner, free):
+        # Detours a path a -> b through free cells x, y side by side along it: a -> x -> y -> b
+        changed = True
+        while changed and free:
+            changed = False
+            for k, route in routes.items():
+                i = 0
+                while i < len(route) - 1:
+                    a, b = route[i], route[i + 1]
+                    for x in self.neighbors[a]:
+                        if x in free:
+                            y = next((y for y in self.neighbors[b] if y in free and y in self.neighbors[x]), None)
+                            if y is not None:
+                                route[i + 1:i + 1] = [x, y]
+                                owner[x] = owner[y] = k
+                                free -= {x, y}
+                                changed = True
+                                break
+                    i += 1
+
+    def longest(self, region, start, end):
+        # Longest path from start to end through region found within DETOUR_NODES nodes, moving first to the cells
+        # with the fewest ways on (ties broken at random)
+        best = None
+        route = [start]
+        visited = {start}
+
+        def following(idx):
+            options = [neighbor for neighbor in self.neighbors[idx] if neighbor in region and neighbor not in visited]
+            self.random.shuffle(options)
+            options.sort(key=lambda x: sum(y in region and y not in visited for y in self.neighbors[x]))
+            return iter(options)
+
+        stack = [following(start)]
+        for _ in range(self.DETOUR_NODES):
+            if not stack:
+                break
+            idx = next(stack[-1], None)
+            if idx is None:
+                stack.pop()
+                visited.discard(route.pop())
+            elif idx == end:
+                if best is None or len(route) + 1 > len(best):
+                    best = route + [end]
+                    if len(best) == len(region):
+                        break
+            else:
+                route.append(idx)
+                visited.add(idx)
+                stack.append(following(idx))
+        return best
+
+    def cover(self, routes, steps):
+        # Hands the free cells to the routes, returns the path of every cell or None if some are left after steps
+        owner = [None] * (self.n * self.n)
+        for k, route in routes.items():
+            for idx in route:
+                owner[idx] = k
+        free = {idx for idx in range(len(owner)) if owner[idx] is None}
+        for _ in range(steps):
+            self.insert_pairs(routes, owner, free)
+            if not free:
+                return owner
+            # a free region and a path next to it, rerouted through both
+            region = {self.random.choice(sorted(free))}
+            stack = list(region)
+            while stack:
+                for neighbor in self.neighbors[stack.pop()]:
+                    if neighbor in free and neighbor not in region:
+                        region.add(neighbor)
+                        stack.append(neighbor)
+            k = self.random.choice(sorted({owner[neighbor] for idx in region for neighbor in self.neighbors[idx]
+                                           if owner[neighbor] is not None}))
+            route = self.longest(region | set(routes[k]), *self.endpoints[k])
+            if route is not None and len(route) >= len(routes[k]):
+                for idx in routes[k]:
+                    owner[idx] = None
+                    free.add(idx)
+                for idx in route:
+                    owner[idx] = k
+                    free.discard(idx)
+                routes[k] = route
+        return None
+
+    def route(self, time_budget):
+        # Path index of every cell, or None if no solution was found within time_budget seconds.
+        # Short paths are routed first, later attempts shuffle the order
+        if not self.endpoints:
+            return None
+        deadline = time.perf_counter() + time_budget
+        order = sorted(range(len(self.endpoints)), key=lambda k: self.distance(*self.endpoints[k]))
+        while time.perf_counter() < deadline:
+            routes = self.negotiate(order)
+            if routes is not None:
+                owner = self.cover(routes, 10 * len(self.endpoints))
+                if owner is not None:
+                    return owner
+            self.random.shuffle(order)
+        return None
+
+    def distance(self, a, b):
+        return abs(a // self.n - b // self.n) + abs(a % self.n - b % self.n)
@@ -1,27 +1,60 @@
+import time
+
 from ortools.sat.python import cp_model
 from puzzle import Puzzle
 
 
+STRATEGIES = ['reach', 'lazy']
+SEA, LAND = 0, -1  # cell states found by deduction, besides the index of the island holding the cell
+
+
 class Nurikabe(Puzzle):
 
-    def __init__(self, rows):
+    def __init__(self, rows, strategy='reach', deduce=True):
+        # strategy 'reach' encodes the connectivity of islands and sea with reach variables,
+        # 'lazy' solves without it and only adds the cuts violated by each solution found (see solve_lazy).
+        # With deduce, the cells decided by simple rules are fixed before the model is built (see deduce)
         super().__init__(len(rows[0]), rows)
         try:
             assert len(self.grid) == self.n * self.n
+            assert strategy in STRATEGIES, f'Unknown strategy {strategy}, expected one of {", ".join(STRATEGIES)}'
         except AssertionError as e:
             raise e
+        self.strategy = strategy
         self.model = cp_model.CpModel()
         self.DOMAIN = len([x for x in self.grid if x != 0])
         self.grid_expr = []
         self.islands = []
         current = 1
         for i in range(len(self.grid)):
-            if self.grid[i] == 0:
-                self.grid_expr.append(self.model.new_int_var(0, self.DOMAIN, f'x[{i}]'))
-            else:
-                self.grid_expr.append(self.model.new_int_var(current, current, f'x[{i}]'))
+            if self.grid[i] != 0:
                 self.islands.append(self.Island(current, i, self.grid[i]))
                 current += 1
+        # Cells every island can reach, a cell only keeps the islands reaching it (and the sea) in its domain
+        self.reachable = self.island_reach()
+        # State of every cell after deduction (None if undecided), and the fraction of cells it decided
+        self.known = [None] * len(self.grid)
+        self.resolved = 0.0
+        self.consistent = True
+        if deduce:
+            self.resolved = self.deduce()
+            self.consistent = self.resolved is not None
+            if self.consistent:
+                self.reachable = self.island_reach(self.known)  # sea and other islands' cells are out of reach
+        reaching = [[0] for _ in self.grid]
+        for island in self.islands:
+            for idx in self.reachable[island.index]:
+                reaching[idx].append(island.index)
+        for i in range(len(self.grid)):
+            if self.grid[i] == 0:
+                values = reaching[i]
+                if self.consistent and self.known[i] is not None:
+                    values = [x for x in values if x == self.known[i] or (self.known[i] == LAND and x != SEA)]
+                self.grid_expr.append(self.model.new_int_var_from_domain(cp_model.Domain.from_values(values),
+                                                                         f'x[{i}]'))
+            else:
+                index = reaching[i][1]  # a clue is only reached by its own island
+                self.grid_expr.append(self.model.new_int_var(index, index, f'x[{i}]'))
 
     def get_rows(self, grid):
         rows = super().get_rows(grid)
@@ -52,6 +85,121 @@ class Nurikabe(Puzzle):
             neighbors.append(r * self.n + c + 1)
         return neighbors
 
+    def island_reach(self, known=None):
+        # For every island, the cells it can reach: {island index: {cell: distance to the clue}}.
+        # An island holds value cells, so none is more than value - 1 steps away from the clue, and it can never
+        # touch another clue or a cell next to one (two islands are always kept apart by the sea).
+        # A breadth-first search from each clue around those cells gives the distances.
+        # known (see deduce) also keeps the search off the sea and the cells of other islands
+        blocked = {}  # cell -> islands whose clue is that cell or next to it
+        for island in self.islands:
+            for idx in [island.pos] + self.get_neighbors(island.pos):
+                blocked.setdefault(idx, set()).add(island.index)
+        reachable = {}
+        for island in self.islands:
+            distances = {island.pos: 0}
+            frontier = [island.pos]
+            for distance in range(1, island.value):
+                next_frontier = []
+                for idx in frontier:
+                    for neighbor in self.get_neighbors(idx):
+                        if neighbor not in distances and blocked.get(neighbor, {island.index}) == {island.index} and \
+                                (known is None or known[neighbor] in (None, LAND, island.index)):
+                            distances[neighbor] = distance
+                            next_frontier.append(neighbor)
+                frontier = next_frontier
+            reachable[island.index] = distances
+        return reachable
+
+    def deduce(self):
+        # Decides cells with simple rules until none applies, in self.known: SEA, LAND (white, island unknown) or
+        # the index of the island holding the cell. Returns the fraction of cells decided (sea or island),
+        # or None if the rules reach a contradiction (the puzzle has no solution).
+        # - a cell no island can reach, or next to cells of two different islands, is sea
+        # - a white cell next to an island, or that only one island can reach, belongs to that island
+        # - the neighbours of a complete island are sea
+        # - an incomplete island, or a part of the sea smaller than the whole sea, with a single way out takes it
+        # - three sea cells of a 2x2 square make the fourth white
+        known = self.known
+        values = {island.index: island.value for island in self.islands}
+        for island in self.islands:
+            known[island.pos] = island.index
+        reaching = [set() for _ in self.grid]
+        for island in self.islands:
+            for idx in self.reachable[island.index]:
+                reaching[idx].add(island.index)
+        sea_size = len(self.grid) - sum(values.values())
+        changed = True
+
+        def decide(idx, state):
+            # Returns False on a contradiction
+            nonlocal changed
+            current = known[idx]
+            if current == state or (state == LAND and current is not None and current > 0):
+                return True
+            if current is None or (current == LAND and state > 0):
+                if state > 0 and state not in reaching[idx]:
+                    return False
+                known[idx] = state
+                changed = True
+                return True
+            return False
+
+        while changed:
+            changed = False
+            for idx in range(len(self.grid)):
+                state = known[idx]
+                if state is None and not reaching[idx] and not decide(idx, SEA):
+                    return None
+                if state is None or state == LAND:
+                    owners = {known[neighbor] for neighbor in self.get_neighbors(idx)
+                              if known[neighbor] is not None and known[neighbor] > 0}
+                    if len(owners) > 1 and not decide(idx, SEA):
+                        return None
+                    if state == LAND:
+                        if len(owners) == 1 and not decide(idx, owners.pop()):
+                            return None
+                        if len(reaching[idx]) == 1 and not decide(idx, next(iter(reaching[idx]))):
+                            return None
+            for island in self.islands:
+                part = self.component(known, island.pos)
+                if len(part) > island.value:
+                    return None
+                exits = [idx for idx in self.boundary(part)
+                         if known[idx] in (None, LAND) and island.index in reaching[idx]]
+                if len(part) == island.value:
+                    if any(known[idx] == island.index for idx in range(len(self.grid)) if idx not in part):
+                        return None
+                    for idx in self.boundary(part):
+                        if not decide(idx, SEA):
+                            return None
+                elif not exits:
+                    return None
+                elif len(exits) == 1 and not decide(exits[0], island.index):
+                    return None
+            seen = set()
+            for idx in range(len(self.grid)):
+                if known[idx] == SEA and idx not in seen:
+                    part = self.component(known, idx)
+                    seen |= part
+                    if len(part) < sea_size:
+                        exits = [neighbor for neighbor in self.boundary(part) if known[neighbor] is None]
+                        if not exits:
+                            return None
+                        if len(exits) == 1 and not decide(exits[0], SEA):
+                            return None
+            for r in range(self.n - 1):
+                for c in range(self.n - 1):
+                    square = [r * self.n + c, r * self.n + c + 1, (r + 1) * self.n + c, (r + 1) * self.n + c + 1]
+                    sea = [idx for idx in square if known[idx] == SEA]
+                    if len(sea) == 4:
+                        return None
+                    if len(sea) == 3:
+                        for idx in square:
+                            if known[idx] is None and not decide(idx, LAND):
+                                return None
+        return sum(state is not None and state != LAND for state in known) / len(self.grid)
+
     """
     Which island does this cell belong to, Mr Programmer? 
     Well, Mr Puter, for each island, take every cell on the board, assign a boolean to it;
@@ -63,64 +211,74 @@ class Nurikabe(Puzzle):
     """
 
     def island_constraints(self):
-        cell_in_island = {}  # for all cells, what island they are in
-        cell_reach = {}  # for all cells, what is the reach of the cell
+        # Variables are only created for the cells an island can reach (see island_reach),
+        # the domains of grid_expr already keep every other cell out of it
+        cell_in_island = {}  # for all reachable cells, whether they are in the island
+        cell_reach = {}  # for all reachable cells, what is the reach of the cell
         for island in self.islands:  # for all islands, what cells are in the island?
             cell_in_island[island.index] = {}
             cell_reach[island.index] = {}
-            for r in range(self.n):
-                for c in range(self.n):
-                    cell_idx = r * self.n + c
-                    cell_in_island[island.index][cell_idx] = self.model.NewBoolVar(
-                        f'cell_{r}_{c}_in_island_{island.index}')  # cell is in island boolean variable
-                    self.model.Add(self.grid_expr[cell_idx] == island.index).OnlyEnforceIf(
-                        cell_in_island[island.index][cell_idx])  # if cell is in island, then grid_expr is island index
-                    self.model.Add(self.grid_expr[cell_idx] != island.index).OnlyEnforceIf(
-                        cell_in_island[island.index][cell_idx].Not())
-
-                    cell_reach[island.index][cell_idx] = self.model.NewIntVar(0, self.n * self.n,
-                                                                              f'reach_{island.index}_{cell_idx}')
-                    self.model.Add(cell_reach[island.index][cell_idx] == 0).OnlyEnforceIf(
-                        cell_in_island[island.index][cell_idx].Not()) # if cell is not in island, then reach is 0
-                    self.model.Add(cell_reach[island.index][cell_idx] > 0).OnlyEnforceIf(
-                        cell_in_island[island.index][cell_idx]) # if cell is in island, then reach is > 0
-
-                    if island.pos == cell_idx:
-                        self.model.Add(
-                            self.grid_expr[cell_idx] == island.index)  # if cell is the number, then grid_expr
-                        # is island index ( => cell is in island)
-                        self.model.Add(cell_reach[island.index][cell_idx] == 1)
-                    else:
-                        self.model.Add(cell_reach[island.index][cell_idx] != 1)
+            for cell_idx, distance in self.reachable[island.index].items():
+                r, c = cell_idx // self.n, cell_idx % self.n
+                cell_in_island[island.index][cell_idx] = self.model.NewBoolVar(
+                    f'cell_{r}_{c}_in_island_{island.index}')  # cell is in island boolean variable
+                self.model.Add(self.grid_expr[cell_idx] == island.index).OnlyEnforceIf(
+                    cell_in_island[island.index][cell_idx])  # if cell is in island, then grid_expr is island index
+                self.model.Add(self.grid_expr[cell_idx] != island.index).OnlyEnforceIf(
+                    cell_in_island[island.index][cell_idx].Not())
+
+                if self.strategy != 'reach':
+                    continue
+                # the reach of a cell in the island is more than its distance to the clue, and at most the value
+                cell_reach[island.index][cell_idx] = self.model.new_int_var_from_domain(
+                    cp_model.Domain.from_intervals([[0], [distance + 1, island.value]]),
+                    f'reach_{island.index}_{cell_idx}')
+                self.model.Add(cell_reach[island.index][cell_idx] == 0).OnlyEnforceIf(
+                    cell_in_island[island.index][cell_idx].Not())  # if cell is not in island, then reach is 0
+                self.model.Add(cell_reach[island.index][cell_idx] > 0).OnlyEnforceIf(
+                    cell_in_island[island.index][cell_idx])  # if cell is in island, then reach is > 0
+
+                if island.pos == cell_idx:
+                    # the number is in the island (its grid_expr is already fixed to the island index)
+                    self.model.Add(cell_reach[island.index][cell_idx] == 1)
+                else:
+                    self.model.Add(cell_reach[island.index][cell_idx] != 1)
             # The size of each island must match the number in the island
-            island_cells = [cell_in_island[island.index][cell_idx] for cell_idx in cell_in_island[island.index]]
+            island_cells = list(cell_in_island[island.index].values())
             self.model.Add(sum(island_cells) == island.value)  # number of cells in island = value of the island
         # Each cell is in at most one island
         for idx in range(self.n * self.n):
-            island_vars = [cell_in_island[island.index][idx] for island in self.islands]
-            self.model.AddAtMostOne(island_vars)
+            island_vars = [cell_in_island[island.index][idx] for island in self.islands
+                           if idx in cell_in_island[island.index]]
+            if len(island_vars) > 1:
+                self.model.AddAtMostOne(island_vars)
 
-        # Island connectivity constraints (all cells in an island must have at least one neighbor in the island)
+        # Island connectivity constraints (all cells in an island but the number have a neighbor in the island
+        # with a reach one less than theirs)
         # Island isolation constraints (all neighbors of a cell in an island that are not in the island must be black)
         for island in self.islands:
-            for idx in range(self.n * self.n):
+            in_island, reach = cell_in_island[island.index], cell_reach[island.index]
+            for idx in in_island:
                 neighbors = self.get_neighbors(idx)
-                neighbor_conditions = []
-                for neighbor in neighbors:
-                    smaller_reach = self.model.NewBoolVar(f'smaller_reach_{idx}_{neighbor}')
-                    self.model.Add(cell_reach[island.index][idx] == cell_reach[island.index][neighbor] + 1)\
-                        .OnlyEnforceIf(smaller_reach)
-                    self.model.Add(cell_reach[island.index][idx] != cell_reach[island.index][neighbor] + 1)\
-                        .OnlyEnforceIf(smaller_reach.Not())
-                    neighbor_conditions.append(smaller_reach)
-
-                self.model.AddAtLeastOne(neighbor_conditions).OnlyEnforceIf(cell_in_island[island.index][idx])
+                if idx != island.pos and self.strategy == 'reach':
+                    neighbor_conditions = []
+                    for neighbor in neighbors:
+                        if neighbor not in in_island:
+                            continue  # reach 0, which would give the cell a reach of 1
+                        smaller_reach = self.model.NewBoolVar(f'smaller_reach_{idx}_{neighbor}')
+                        self.model.Add(reach[idx] == reach[neighbor] + 1).OnlyEnforceIf(smaller_reach)
+                        self.model.Add(reach[idx] != reach[neighbor] + 1).OnlyEnforceIf(smaller_reach.Not())
+                        neighbor_conditions.append(smaller_reach)
+                    self.model.AddBoolOr(neighbor_conditions).OnlyEnforceIf(in_island[idx])
                 # if neighbor is not in the island, then neighbor is in the sea
                 # thus it must be black and value must be 0
                 for neighbor in neighbors:
-                    self.model.Add(self.grid_expr[neighbor] == 0).OnlyEnforceIf(
-                        [cell_in_island[island.index][idx], cell_in_island[island.index][neighbor].Not()])
-
+                    if neighbor in in_island:
+                        self.model.Add(self.grid_expr[neighbor] == 0).OnlyEnforceIf(
+                            [in_island[idx], in_island[neighbor].Not()])
+                    else:
+                        self.model.Add(self.grid_expr[neighbor] == 0).OnlyEnforceIf(in_island[idx])
+        self.cell_in_island = cell_in_island
 
     """
     If cell is black, then it has a value of 0
@@ -147,13 +305,18 @@ class Nurikabe(Puzzle):
                 if r < self.n - 1 and c < self.n - 1:
                     self.model.Add(self.grid_expr[idx] + self.grid_expr[idx + 1] + self.grid_expr[idx + self.n] +
                                    self.grid_expr[idx + self.n + 1] > 0)
+                cells_is_black[idx] = cell_is_black
+                if self.strategy != 'reach':
+                    continue
 
                 reach[idx] = self.model.NewIntVar(0, self.n * self.n, f'reach_{idx}')
                 # if cell is white, then reach is 0
                 self.model.Add(reach[idx] == 0).OnlyEnforceIf(cell_is_black.Not())
                 # if cell is black, then reach is > 0
                 self.model.Add(reach[idx] > 0).OnlyEnforceIf(cell_is_black)
-                cells_is_black[idx] = cell_is_black
+        self.cell_is_black = cells_is_black
+        if self.strategy != 'reach':
+            return
 
         # once every reach constraint is set up, we can set up the reachability constraints
         # at most one cell can be the root of a sea, with a reach of one and neighbors with a reach of 0 valid
@@ -180,9 +343,77 @@ class Nurikabe(Puzzle):
                 self.model.AddAtLeastOne(neighbor_conditions).OnlyEnforceIf(cells_is_black[idx])
         self.model.AddExactlyOne(cell_is_root)
 
+    def connectivity_cuts(self, sol):
+        # Adds to the model the cuts that the solution sol violates, returns how many were added.
+        # An island reaching only a set of cells C around its clue, smaller than its value, must take one of the
+        # cells next to C. A sea split into several parts: the sea is bigger than any part C, so a black cell of C
+        # needs a black cell next to C to get out of it
+        cuts = 0
+        for island in self.islands:
+            part = self.component(sol, island.pos)
+            if len(part) < island.value:
+                boundary = self.boundary(part) & self.cell_in_island[island.index].keys()
+                self.model.AddBoolOr([self.cell_in_island[island.index][idx] for idx in boundary])
+                cuts += 1
+        sea = [idx for idx in range(len(sol)) if sol[idx] == 0]
+        parts = []
+        seen = set()
+        for idx in sea:
+            if idx not in seen:
+                parts.append(self.component(sol, idx))
+                seen |= parts[-1]
+        if len(parts) > 1:
+            for part in parts:
+                boundary = [self.cell_is_black[idx] for idx in self.boundary(part)]
+                for idx in part:
+                    self.model.AddBoolOr(boundary + [self.cell_is_black[idx].Not()])
+                    cuts += 1
+        return cuts
+
+    def component(self, sol, start):
+        # Cells connected to start with the same value in sol
+        part = {start}
+        stack = [start]
+        while stack:
+            idx = stack.pop()
+            for neighbor in self.get_neighbors(idx):
+                if neighbor not in part and sol[neighbor] == sol[start]:
+                    part.add(neighbor)
+                    stack.append(neighbor)
+        return part
+
+    def boundary(self, part):
+        # Cells next to a set of cells, outside of it
+        return {neighbor for idx in part for neighbor in self.get_neighbors(idx) if neighbor not in part}
+
+    def solve_lazy(self, time_limit=None):
+        # Solves without connectivity constraints, then adds the cuts the solution violates and solves again,
+        # starting from the previous solution, until the islands and the sea are connected.
+        # Raises TimeoutError if the rounds take more than time_limit seconds in all
+        solver = cp_model.CpSolver()
+        deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        while True:
+            if deadline is not None:
+                solver.parameters.max_time_in_seconds = max(0.0, deadline - time.perf_counter())
+            status = solver.Solve(self.model)
+            if status == cp_model.UNKNOWN and deadline is not None:
+                raise TimeoutError(f'No Nurikabe solution within {time_limit} seconds')
+            if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+                return None
+            sol = [solver.Value(x) for x in self.grid_expr]
+            if not self.connectivity_cuts(sol):
+                return sol
+            self.model.ClearHints()
+            for x, value in zip(self.grid_expr, sol):
+                self.model.AddHint(x, value)
+
     def solve(self):
+        if not self.consistent:
+            return None
         self.island_constraints()
         self.sea_constraints()
+        if self.strategy == 'lazy':
+            return self.solve_lazy()
         # solve the model
         solver = cp_model.CpSolver()
         status = solver.Solve(self.model)
@@ -0,0 +1,151 @@
+import random
+
+from nurikabe import Nurikabe
+
+
+class NurikabeGenerator:
+    """
+    Generates Nurikabe puzzles with a unique solution.
+    The sea is grown from a random cell, one random neighbouring cell at a time, never closing a 2x2 pool, until it
+    covers sea_rate of the board; it stays connected by construction. The cells left are the islands; the sea then
+    floods islands bigger than max_island, whose many possible shapes make the search slow and rarely unique.
+    Every island gets its size as clue on a random cell of it.
+    The clue board is then searched for a solution other than the intended one (deduction alone often settles it,
+    otherwise the lazy Nurikabe model is solved with the intended solution blocked, stopping at the first one).
+    When there is one, the sea grows into a cell of every island that the other solution paints sea where the
+    intended one does not, which rules that solution out and cuts those islands, and the board is checked again.
+    A check that takes longer than CHECK_TIME drops the sea for a new one, rare boards whose lazy search needs many
+    rounds of cuts would otherwise cost more than many fresh seas.
+    """
+
+    SEA_RATE = 0.6  # fraction of the board grown as sea before the first uniqueness check
+    REPAIRS = 50  # sea cells grown after the first check before growing a new sea
+    CHECK_TIME = 0.5  # seconds
+
+    def __init__(self, n, seed=None, sea_rate=SEA_RATE, max_island=None):
+        self.n = n
+        self.sea_rate = sea_rate
+        self.max_island = max_island if max_island is not None else n
+        self.random = random.Random(seed)
+        self.neighbors = []
+        for idx in range(n * n):
+            r, c = idx // n, idx % n
+            self.neighbors.append([(r + dr) * n + c + dc for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                                   if 0 <= r + dr < n and 0 <= c + dc < n])
+
+    def closes_pool(self, sea, idx):
+        # Whether making idx sea fills a 2x2 square of sea
+        r, c = idx // self.n, idx % self.n
+        for top in (r - 1, r):
+            for left in (c - 1, c):
+                if 0 <= top < self.n - 1 and 0 <= left < self.n - 1:
+                    square = [top * self.n + left, top * self.n + left + 1,
+                              (top + 1) * self.n + left, (top + 1) * self.n + left + 1]
+                    if all(cell == idx or cell in sea for cell in square):
+                        return True
+        return False
+
+    def can_flood(self, sea, idx):
+        # Whether idx can join the sea, keeping it connected and without pools
+        return idx not in sea and any(neighbor in sea for neighbor in self.neighbors[idx]) and \
+            not self.closes_pool(sea, idx)
+
+    def grow(self, size):
+        # A connected sea of at most size cells, smaller if no cell can be added without a pool
+        start = self.random.randrange(self.n * self.n)
+        sea = {start}
+        frontier = set(self.neighbors[start])
+        while frontier and len(sea) < size:
+            idx = self.random.choice(sorted(frontier))
+            frontier.discard(idx)
+            if not self.closes_pool(sea, idx):
+                sea.add(idx)
+                frontier |= {neighbor for neighbor in self.neighbors[idx] if neighbor not in sea}
+        return sea
+
+    def islands(self, sea):
+        # Connected components of the cells outside the sea
+        islands = []
+        seen = set()
+        for idx in range(self.n * self.n):
+            if idx not in sea and idx not in seen:
+                island = [idx]
+                seen.add(idx)
+                for cell in island:
+                    for neighbor in self.neighbors[cell]:
+                        if neighbor not in sea and neighbor not in seen:
+                            seen.add(neighbor)
+                            island.append(neighbor)
+                islands.append(island)
+        return islands
+
+    def place_clues(self, islands, clues):
+        # One clue cell per island, keeping the current clue of an island when it still holds one
+        placed = []
+        for island in islands:
+            kept = [idx for idx in island if idx in clues]
+            placed.append(kept[0] if kept else self.random.choice(island))
+        return placed
+
+    def board(self, islands, clues):
+        grid = [0] * (self.n * self.n)
+        for island, pos in zip(islands, clues):
+            grid[pos] = len(island)
+        return [grid[i:i + self.n] for i in range(0, self.n * self.n, self.n)]
+
+    def other_solution(self, rows, sea):
+        # A solution of the clue board whose sea differs from sea, None if there is none.
+        # Raises TimeoutError if the search takes more than CHECK_TIME
+        nurikabe = Nurikabe(rows, 'lazy')
+        if not nurikabe.consistent:
+            raise ValueError('The intended solution does not solve its own clues')
+        if nurikabe.resolved == 1:  # deduction decided every cell
+            return None
+        nurikabe.island_constraints()
+        nurikabe.sea_constraints()
+        nurikabe.model.AddBoolOr([nurikabe.cell_is_black[idx].Not() if idx in sea else nurikabe.cell_is_black[idx]
+                                  for idx in range(self.n * self.n)])
+        return nurikabe.solve_lazy(self.CHECK_TIME)
+
+    def puzzle(self):
+        # Returns the rows of the clue board and its solution, as Nurikabe.solve gives it
+        while True:
+            sea = self.grow(int(self.sea_rate * self.n * self.n))
+            clues = set()
+            for _ in range(self.REPAIRS):
+                islands = self.islands(sea)
+                largest = max(islands, key=len)
+                if len(largest) > self.max_island:
+                    flooded = [idx for idx in largest if self.can_flood(sea, idx)]
+                    if not flooded:
+                        break
+                    sea.add(self.random.choice(flooded))
+                    continue
+                placed = self.place_clues(islands, clues)
+                clues = set(placed)
+                rows = self.board(islands, placed)
+                try:
+                    other = self.other_solution(rows, sea)
+                except TimeoutError:
+                    break
+                if other is None:
+                    # islands are numbered in the order of their clues, row by row
+                    solution = [0] * (self.n * self.n)
+                    for index, (_, island) in enumerate(sorted(zip(placed, islands)), 1):
+                        for idx in island:
+                            solution[idx] = index
+                    return rows, solution
+                # one cell per island that the other solution shrinks or moves
+                grown = False
+                for island in islands:
+                    flooded = [idx for idx in island if other[idx] == 0 and self.can_flood(sea, idx)]
+                    if flooded:
+                        sea.add(self.random.choice(flooded))
+                        grown = True
+                if not grown:
+                    break
+
+    def puzzles(self, count):
+        # Yields count puzzles, for filling a puzzle pool in bulk
+        for _ in range(count):
+            yield self.puzzle()
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PuzzlePool:
+    """
+    Ready-made puzzles kept in memory for every (type, size, difficulty) that has been asked for.
+    Taking a puzzle is a pop from a deque; when a pool drops below low_water, a background worker generates
+    puzzles until it holds capacity of them again. Only when a pool is empty is a puzzle generated on demand.
+    generator is called as generator(puzzle, size, difficulty=difficulty) and may raise for unsupported keys,
+    in which case nothing is pooled for them.
+    At most max_pools keys are pooled; a new key evicts the pool of the key least recently asked for.
+    """
+
+    def __init__(self, generator, capacity=20, low_water=5, workers=2, max_pools=16):
+        self.generator = generator
+        self.capacity = capacity
+        self.low_water = low_water
+        self.max_pools = max_pools
+        self.pools = OrderedDict()  # least recently asked for first
+        self.refilling = set()  # keys with a refill running or queued
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='puzzle-pool')
+
+    def get(self, puzzle, size, difficulty=None):
+        key = (puzzle, size, difficulty)
+        with self.lock:
+            pool = self.pools.get(key)
+            generated = pool.popleft() if pool else None
+            if pool is not None:
+                self.pools.move_to_end(key)
+        if generated is None:
+            generated = self.generator(puzzle, size, difficulty=difficulty)
+            if generated is None:  # nothing to pool for this key
+                return None
+        self.refill(key)
+        return generated
+
+    def size(self, puzzle, size, difficulty=None):
+        # Number of ready puzzles for a key
+        with self.lock:
+            return len(self.pools.get((puzzle, size, difficulty), ()))
+
+    def refill(self, key):
+        # Schedules a refill of the pool of key if it is below the low-water mark and none is scheduled yet
+        with self.lock:
+            if key not in self.pools:
+                while len(self.pools) >= self.max_pools:
+                    self.pools.popitem(last=False)  # a refill running for it stops at its next puzzle
+                self.pools[key] = deque()
+            pool = self.pools[key]
+            if len(pool) >= self.low_water or key in self.refilling:
+                return
+            self.refilling.add(key)
+        self.executor.submit(self.fill, key)
+
+    def warm(self, keys):
+        # Fills the pools of the given (type, size, difficulty) keys in the background, e.g. at start-up
+        for key in keys:
+            self.refill(key)
+
+    def fill(self, key):
+        puzzle, size, difficulty = key
+        try:
+            while self.size(*key) < self.capacity:
+                generated = self.generator(puzzle, size, difficulty=difficulty)
+                if generated is None:
+                    break
+                with self.lock:
+                    if key not in self.pools:  # evicted meanwhile
+                        break
+                    self.pools[key].append(generated)
+        except Exception as e:
+            print(f"Error refilling the {key} puzzle pool: {e}")
+        finally:
+            with self.lock:
+                self.refilling.discard(key)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
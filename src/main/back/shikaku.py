@@ -1,14 +1,87 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
 from ortools.sat.python import cp_model
+from exact_cover import ExactCover, SearchLimitReached
 from puzzle import Puzzle
 
+METHODS = ['placements', 'bounds']
+
+MAX_WORKERS = 4  # processes of the pool solving independent regions
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+_IN_POOL = False  # set in the processes of the pool
+
+
+def _mark_pool():
+    global _IN_POOL
+    _IN_POOL = True
+
+
+def get_executor():
+    # Process pool shared by every board, started on first use. None where no pool can be used: a daemonic process
+    # (e.g. a worker of a multiprocessing.Pool) may not start children, and a process of the pool itself would
+    # start a pool of its own. forkserver starts the workers from a clean process rather than from a threaded server
+    global _EXECUTOR
+    if _IN_POOL or multiprocessing.current_process().daemon:
+        return None
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _EXECUTOR = ProcessPoolExecutor(max_workers=min(MAX_WORKERS, os.cpu_count() or 1), mp_context=context,
+                                            initializer=_mark_pool)
+        return _EXECUTOR
+
+
+@lru_cache(maxsize=1 << 16)
+def rectangle_cells(n, placement):
+    # Cells of a placement (top, left, bottom, right) on an n x n board, shared by every board of that size
+    top, left, bottom, right = placement
+    return tuple(r * n + c for r in range(top, bottom + 1) for c in range(left, right + 1))
+
+
+def solve_cover(rows, columns, node_limit):
+    # Exact cover of columns by rows (row id -> cells), as the list of chosen row ids or None if there is none.
+    # Past node_limit search nodes, CP-SAT gets the same rows: one bool per row, every column covered exactly once.
+    # Module-level so that it can run in the process pool
+    try:
+        return ExactCover(rows, columns, node_limit).solve()
+    except SearchLimitReached:
+        pass
+    model = cp_model.CpModel()
+    chosen = {key: model.new_bool_var(f'p{key}') for key in rows}
+    covering = {column: [] for column in columns}
+    for key, cells in rows.items():
+        for cell in cells:
+            covering[cell].append(chosen[key])
+    for literals in covering.values():
+        model.AddExactlyOne(literals)
+    solver = cp_model.CpSolver()
+    status = solver.Solve(model)
+    if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+        return None
+    return [key for key, literal in chosen.items() if solver.Value(literal)]
+
 
 class Shikaku(Puzzle):
-    def __init__(self, rows):
+    NODE_LIMIT = 100000  # exact cover search nodes before handing the placements to CP-SAT
+    PARALLEL_CELLS = 900  # open cells left after propagation from which independent regions go to the process pool
+
+    def __init__(self, rows, method='placements'):
+        # method 'placements' solves an exact cover over the legal placements of every rectangle,
+        # 'bounds' the CP-SAT model on the bounds of the rectangles
         super().__init__(len(rows[0]), rows)
         try:
             assert len(self.grid) == self.n * self.n
+            assert method in METHODS, f'Unknown method {method}, expected one of {", ".join(METHODS)}'
         except AssertionError as e:
             raise e
+        self.method = method
         self.model = cp_model.CpModel()
         self.DOMAIN = len([x for x in self.grid if x != 0]) - 1
         self.grid_expr = []
@@ -47,6 +120,10 @@ class Shikaku(Puzzle):
             self.source_row = self.pos // shikaku.n
             self.source_col = self.pos % shikaku.n
 
+            # The bound variables and their constraints are only needed by the 'bounds' model
+            if shikaku.method != 'bounds':
+                return
+
             # Define rectangle boundaries
             self.top = shikaku.model.new_int_var(0, shikaku.n - 1, f'top_{self.index}')
             self.left = shikaku.model.new_int_var(0, shikaku.n - 1, f'left_{self.index}')
@@ -70,6 +147,147 @@ class Shikaku(Puzzle):
             # Ensure the rectangle is the correct area
             shikaku.model.add_multiplication_equality(self.value, self.width, self.height)
 
+    def placements(self):
+        # Every legal placement of every rectangle as (top, left, bottom, right): its height and width are
+        # a factor pair of its value, and it covers its own clue and no other one
+        n = self.n
+        # clues[r][c] is the number of clues in the rows above r and columns left of c
+        clues = [[0] * (n + 1) for _ in range(n + 1)]
+        for r in range(n):
+            for c in range(n):
+                clues[r + 1][c + 1] = clues[r][c + 1] + clues[r + 1][c] - clues[r][c] + (self.grid[r * n + c] != 0)
+        placements = []
+        for rect in self.rectangles:
+            options = []
+            for height in range(1, min(rect.value, n) + 1):
+                width = rect.value // height
+                if height * width != rect.value or width > n:
+                    continue
+                for top in range(max(0, rect.source_row - height + 1), min(rect.source_row, n - height) + 1):
+                    bottom = top + height - 1
+                    for left in range(max(0, rect.source_col - width + 1), min(rect.source_col, n - width) + 1):
+                        right = left + width - 1
+                        if clues[bottom + 1][right + 1] - clues[top][right + 1] - clues[bottom + 1][left] + \
+                                clues[top][left] == 1:
+                            options.append((top, left, bottom, right))
+            placements.append(options)
+        return placements
+
+    def cells(self, placement):
+        return rectangle_cells(self.n, placement)
+
+    def cover_rows(self, placements, indexes=None):
+        # Exact cover rows: (rectangle index, placement index) -> cells covered, for the rectangles of indexes
+        # (all by default). The clue cell is only covered by the placements of its own rectangle,
+        # so covering every cell once also picks one placement per rectangle
+        if indexes is None:
+            indexes = range(len(placements))
+        return {(index, k): self.cells(placement) for index in indexes for k, placement in enumerate(placements[index])}
+
+    def propagate(self, placements):
+        # Fixes the forced placements until none is left: the last placement of a rectangle, or the last placement
+        # covering a cell. placements is narrowed in place to what the fixed rectangles leave free.
+        # Returns {rectangle index: placement} for the fixed rectangles, or None on a contradiction
+        taken = set()
+        fixed = {}
+        while True:
+            forced = {index: options[0] for index, options in enumerate(placements)
+                      if index not in fixed and len(options) == 1}
+            if not forced:
+                covering = [[] for _ in self.grid]
+                for index, options in enumerate(placements):
+                    if index not in fixed:
+                        for p in options:
+                            for cell in self.cells(p):
+                                covering[cell].append((index, p))
+                for cell, options in enumerate(covering):
+                    if cell not in taken:
+                        if not options:
+                            return None
+                        if len(options) == 1:
+                            forced[options[0][0]] = options[0][1]
+            if not forced:
+                return fixed
+            for index, p in forced.items():
+                cells = self.cells(p)
+                if not taken.isdisjoint(cells):
+                    return None  # two forced placements overlap
+                taken.update(cells)
+                fixed[index] = p
+                placements[index] = [p]
+            for index, options in enumerate(placements):
+                if index not in fixed:
+                    options[:] = [p for p in options if taken.isdisjoint(self.cells(p))]
+                    if not options:
+                        return None
+
+    def regions(self, placements, fixed):
+        # Groups the rectangles left open into independent regions: two rectangles are in the same region when
+        # some of their placements share a cell. Returns a list of (rectangle indexes, cells) pairs
+        parent = list(range(len(self.grid)))
+
+        def find(cell):
+            while parent[cell] != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        for index, options in enumerate(placements):
+            if index not in fixed:
+                root = find(self.rectangles[index].pos)
+                for p in options:
+                    for cell in self.cells(p):
+                        parent[find(cell)] = root
+        regions = {}
+        for index in range(len(placements)):
+            if index not in fixed:
+                regions.setdefault(find(self.rectangles[index].pos), []).append(index)
+        return [(indexes, sorted({cell for index in indexes for p in placements[index] for cell in self.cells(p)}))
+                for indexes in regions.values()]
+
+    def solve_placements(self):
+        # Returns the chosen placement of every rectangle, or None if there is no solution.
+        # After propagation the open rectangles fall apart into independent regions, each its own exact cover;
+        # on big boards with several regions they are solved concurrently in the process pool, where one can be used
+        placements = self.placements()
+        if not all(placements):
+            return None
+        chosen = self.propagate(placements)
+        if chosen is None:
+            return None
+        regions = self.regions(placements, chosen)
+        jobs = [(self.cover_rows(placements, indexes), cells, self.NODE_LIMIT) for indexes, cells in regions]
+        executor = None
+        if len(jobs) > 1 and sum(len(cells) for _, cells in regions) >= self.PARALLEL_CELLS:
+            executor = get_executor()
+        if executor is not None:
+            results = [future.result() for future in [executor.submit(solve_cover, *job) for job in jobs]]
+        else:
+            results = [solve_cover(*job) for job in jobs]
+        for keys in results:
+            if keys is None:
+                return None
+            for index, k in keys:
+                chosen[index] = placements[index][k]
+        return chosen
+
+    def count_solutions(self, limit=2):
+        # Number of solutions, counted up to limit: the product of the counts of the independent regions.
+        # Raises SearchLimitReached if a region needs more than NODE_LIMIT search nodes
+        placements = self.placements()
+        if not all(placements):
+            return 0
+        fixed = self.propagate(placements)
+        if fixed is None:
+            return 0
+        count = 1
+        for indexes, cells in self.regions(placements, fixed):
+            count *= ExactCover(self.cover_rows(placements, indexes), cells, self.NODE_LIMIT).count(limit)
+            if count == 0:
+                return 0
+            count = min(count, limit)
+        return count
+
     def constraints(self):
         # Create a 2D array to store which cells belong to which rectangles
         # cell_in_rect[cell_idx][rect_idx] indicates if cell (r,c) is in rectangle rect_idx
@@ -121,6 +339,24 @@ class Shikaku(Puzzle):
                         cell_in_rect[cell_idx][rect.index])
 
     def solve(self):
+        if self.method == 'placements':
+            chosen = self.solve_placements()
+            if chosen is None:
+                return None
+            result = [0] * len(self.grid)
+            rectangles_info = {}
+            for rect in self.rectangles:
+                top, left, bottom, right = chosen[rect.index]
+                for r in range(top, bottom + 1):
+                    result[r * self.n + left:r * self.n + right + 1] = [rect.index] * (right - left + 1)
+                rectangles_info[rect.index] = {
+                    'top': top,
+                    'left': left,
+                    'bottom': bottom,
+                    'right': right,
+                    'value': rect.value,
+                }
+            return result, rectangles_info
         self.constraints()
         solver = cp_model.CpSolver()
         status = solver.Solve(self.model)
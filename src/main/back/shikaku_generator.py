@@ -0,0 +1,84 @@
+import random
+
+from exact_cover import ExactCover, SearchLimitReached
+from shikaku import Shikaku, rectangle_cells
+
+
+class ShikakuGenerator:
+    """
+    Generates Shikaku puzzles with a unique solution.
+    The board is cut into rectangles by recursive splitting: a rectangle is split at a random line while its area
+    is above max_area, and below that it is kept with probability 1/2, so that sizes vary.
+    Every rectangle gets its clue at a random cell, then the clue board is checked for a second solution.
+    When one is found, one of the rectangles it places differently gets its clue moved into the part of the
+    rectangle that the other placement leaves out, which rules that placement out, and the board is checked again.
+    Moving a single clue at a time converges far more often than moving all of them, which keeps creating
+    new ambiguities.
+    Only the independent regions left after forced placements are searched, and the search stops at the first
+    solution that differs from the partition.
+    """
+
+    REPAIRS = 100  # clue moves tried on a partition before cutting a new one
+
+    def __init__(self, n, seed=None, max_area=None):
+        self.n = n
+        self.max_area = max_area if max_area is not None else max(4, n * n // 14)
+        self.random = random.Random(seed)
+
+    def partition(self):
+        # Rectangles (top, left, bottom, right) covering the board
+        rectangles = []
+        pending = [(0, 0, self.n - 1, self.n - 1)]
+        while pending:
+            top, left, bottom, right = pending.pop()
+            height, width = bottom - top + 1, right - left + 1
+            if height * width <= self.max_area and (height * width <= 2 or self.random.random() < 0.5):
+                rectangles.append((top, left, bottom, right))
+            elif height > width or (height == width and self.random.random() < 0.5):
+                cut = top + self.random.randrange(1, height)
+                pending += [(top, left, cut - 1, right), (cut, left, bottom, right)]
+            else:
+                cut = left + self.random.randrange(1, width)
+                pending += [(top, left, bottom, cut - 1), (top, cut, bottom, right)]
+        return rectangles
+
+    def cells(self, rectangle):
+        return rectangle_cells(self.n, rectangle)
+
+    def other_solution(self, shikaku, intended):
+        # The placements of a solution that differs from intended (clue position -> rectangle), None if there is none.
+        # Forced placements hold in every solution, so only the open regions are searched
+        placements = shikaku.placements()
+        fixed = shikaku.propagate(placements)
+        if fixed is None:
+            raise ValueError('The partition is not a solution of its own clues')
+        for indexes, cells in shikaku.regions(placements, fixed):
+            cover = ExactCover(shikaku.cover_rows(placements, indexes), cells, shikaku.NODE_LIMIT)
+            for keys in cover.search():
+                chosen = {shikaku.rectangles[index].pos: placements[index][k] for index, k in keys}
+                if any(intended[pos] != placement for pos, placement in chosen.items()):
+                    return chosen
+        return None
+
+    def puzzle(self):
+        # Returns the rows of the clue board and the rectangles of its solution
+        while True:
+            rectangles = self.partition()
+            clues = [self.random.choice(self.cells(rectangle)) for rectangle in rectangles]
+            for _ in range(self.REPAIRS):
+                grid = [0] * (self.n * self.n)
+                for rectangle, pos in zip(rectangles, clues):
+                    top, left, bottom, right = rectangle
+                    grid[pos] = (bottom - top + 1) * (right - left + 1)
+                rows = [grid[i:i + self.n] for i in range(0, self.n * self.n, self.n)]
+                intended = dict(zip(clues, rectangles))
+                try:
+                    other = self.other_solution(Shikaku(rows), intended)
+                except SearchLimitReached:
+                    break
+                if other is None:
+                    return rows, rectangles
+                k = self.random.choice([k for k, (rectangle, pos) in enumerate(zip(rectangles, clues))
+                                        if other.get(pos, rectangle) != rectangle])
+                outside = set(self.cells(rectangles[k])) - set(self.cells(other[clues[k]]))
+                clues[k] = self.random.choice(sorted(outside))
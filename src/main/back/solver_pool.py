@@ -0,0 +1,143 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+
+
+class PoolFull(Exception):
+    pass
+
+
+def serve(conn, solver):
+    # Loop of a worker process. solver and the modules it needs (ortools, the puzzles) were imported when the
+    # process started, so a job only pays for the solve.
+    # The worker leads a process group of its own, so that the processes a solver starts are stopped with it
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    while True:
+        try:
+            args, kwargs = conn.recv()
+        except EOFError:  # the pool closed its end
+            return
+        try:
+            result = (True, solver(*args, **kwargs))
+        except Exception as e:
+            result = (False, e)
+        conn.send(result)
+
+
+class SolverPool:
+    """
+    Runs a solver in a set of worker processes, so that a slow solve holds neither a request thread nor the GIL
+    of the server. Workers are started ahead of the first job and import the solver's modules as they start.
+    At most workers + max_queue jobs are taken at a time (running or waiting for a worker), more raise PoolFull.
+    A job running longer than its timeout gets its worker killed and replaced, and raises TimeoutError.
+    A worker is also replaced after max_jobs jobs, which caps the memory a worker can pile up.
+    Workers are not daemonic, so that a solver can start processes of its own (Shikaku solves regions in a process
+    pool); terminate kills them all, and runs at exit so that the interpreter does not wait for them.
+    solver is called as solver(*args, **kwargs) in a worker: it must be a module-level function, and its arguments,
+    result and exceptions picklable. Exceptions it raises are raised again by solve.
+    """
+
+    def __init__(self, solver, workers=2, max_queue=8, timeout=30, max_jobs=100):
+        self.solver = solver
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        # forkserver forks workers from a clean process, where available, rather than from the threaded server
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self.idle = queue.Queue()
+        self.slots = threading.BoundedSemaphore(workers + max_queue)
+        self.lock = threading.Lock()
+        self.started = False
+        self.live = set()  # every worker started and not stopped, idle or running a job
+
+    class Worker:
+        def __init__(self, process, conn):
+            self.process = process
+            self.conn = conn
+            self.jobs = 0
+
+    def start(self):
+        # Starts the workers, e.g. at start-up; solve otherwise does it on the first job
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        atexit.register(self.terminate)
+        for _ in range(self.workers):
+            self.idle.put(self.spawn())
+
+    def spawn(self):
+        conn, child = self.context.Pipe()
+        process = self.context.Process(target=serve, args=(child, self.solver), name='solver-pool', daemon=False)
+        process.start()
+        child.close()
+        worker = self.Worker(process, conn)
+        with self.lock:
+            self.live.add(worker)
+        return worker
+
+    def stop(self, worker):
+        with self.lock:
+            self.live.discard(worker)
+        worker.conn.close()
+        if hasattr(os, 'killpg'):
+            try:
+                os.killpg(worker.process.pid, signal.SIGTERM)
+            except ProcessLookupError:  # exited already, or before it made its group
+                pass
+        worker.process.terminate()
+        worker.process.join()
+
+    def solve(self, *args, timeout=None, **kwargs):
+        # Result of solver(*args, **kwargs), raises TimeoutError if it takes more than timeout seconds
+        # (self.timeout by default)
+        if not self.slots.acquire(blocking=False):
+            raise PoolFull(f'{self.workers + self.max_queue} solves are already running or waiting')
+        try:
+            self.start()
+            worker = self.idle.get()
+            timeout = timeout if timeout is not None else self.timeout
+            try:
+                worker.conn.send((args, kwargs))
+                if not worker.conn.poll(timeout):
+                    raise TimeoutError(f'No solution within {timeout} seconds')
+                ok, result = worker.conn.recv()
+            except TimeoutError:  # before OSError, which it derives from
+                self.stop(worker)
+                self.idle.put(self.spawn())
+                raise
+            except (EOFError, OSError) as e:
+                self.stop(worker)
+                self.idle.put(self.spawn())
+                raise RuntimeError('The solver process died') from e
+            worker.jobs += 1
+            if worker.jobs >= self.max_jobs:
+                self.stop(worker)
+                worker = self.spawn()
+            self.idle.put(worker)
+        finally:
+            self.slots.release()
+        if not ok:
+            raise result
+        return result
+
+    def shutdown(self):
+        # Stops the idle workers (all of them once no solve is running)
+        while True:
+            try:
+                self.stop(self.idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def terminate(self):
+        # Kills every worker, idle or not; a solve running meanwhile raises RuntimeError
+        with self.lock:
+            workers, self.live = self.live, set()
+        for worker in workers:
+            self.stop(worker)
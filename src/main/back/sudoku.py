@@ -1,21 +1,38 @@
+from math import isqrt
+
 from ortools.sat.python import cp_model
-from puzzle import Puzzle
+from exact_cover import SearchLimitReached
+from latin_square import LatinSquare
+from sudoku_batch import SOLVED, OPEN, solve_batch
+from sudoku_engine import SudokuEngine
+from sudoku_generator import SudokuGenerator
 
 
-class Sudoku(Puzzle):
-    def __init__(self, rows):
-        super().__init__(9, rows)
+class Sudoku(LatinSquare):
+    def __init__(self, rows, propagate=True):
+        super().__init__(len(rows[0]), rows, isqrt(len(rows[0])))  # box is the side of a box, 3 for a 9x9 grid
         try:
-            assert len(self.grid) == 81, f'Grid has size {len(self.grid)} instead of 81'
-            assert max(self.grid) <= 9, f'Grid has value {max(self.grid)} which is greater than 9'
+            assert self.box * self.box == self.n, f'Grid side {self.n} is not a square number'
+            assert len(self.grid) == self.n * self.n, f'Grid has size {len(self.grid)} instead of {self.n * self.n}'
+            assert max(self.grid) <= self.n, f'Grid has value {max(self.grid)} which is greater than {self.n}'
             assert min(self.grid) >= 0, f'Grid has value {min(self.grid)} which is less than 0'
         except AssertionError:
             raise
-        self.model = cp_model.CpModel()  # Create the model
-        self.DOMAIN = 9
-        self.grid_expr = [
-            self.model.new_int_var(1, 9, 'x[%i]' % i) if x == 0 else self.model.new_int_var(x, x, 'x[%i]' % i) for i, x
-            in enumerate(self.grid)]
+        self.DOMAIN = self.n
+        # Singles are propagated before the model is built, so that every variable starts with its reduced domain
+        # rather than 1..n. If the givens contradict each other, the model is left with full domains,
+        # it will be found infeasible anyway
+        # On bigger grids plain exact cover search falls behind CP-SAT's AllDifferent propagation as soon as
+        # it has to backtrack a little, so the engine gives up early and lets CP-SAT take over
+        node_limit = SudokuEngine.NODE_LIMIT if self.box <= 3 else self.n * self.n
+        self.engine = SudokuEngine(self.grid, self.box, node_limit)
+        self.consistent = self.engine.consistent and (not propagate or self.engine.propagate())
+        if propagate and self.consistent:
+            domains = [self.engine.candidates(i) for i in range(len(self.grid))]
+        else:
+            domains = [[x] if x != 0 else list(range(1, self.n + 1)) for x in self.grid]
+        # The AllDifferent constraints on rows, columns and boxes come with the shared model
+        self.new_model([cp_model.Domain.from_values(values) for values in domains])
 
     def get_rows(self, grid):
         rows = super().get_rows(grid)
@@ -26,32 +43,18 @@ class Sudoku(Puzzle):
         return cols
 
     def get_squares(self, grid):
-        squares = [[] for _ in range(9)]
-        rows = self.get_rows(grid)
-        for r in range(9):
-            for c in range(9):
-                square_index = (r // 3) * 3 + (c // 3)  # Calculate which square the cell belongs to
-                squares[square_index].append(rows[r][c])
-        return squares
-
-    def constraints(self, grid):
-        # AllDifferent on rows
-        rows = self.get_rows(grid)
-        for row in rows:
-            self.model.add_all_different(row)
-
-        # AllDifferent on columns
-        cols = self.get_cols(grid)
-        for col in cols:
-            self.model.add_all_different(col)
-
-        # AllDifferent on squares
-        sqrs = self.get_squares(grid)
-        for sqr in sqrs:
-            self.model.add_all_different(sqr)
-
-    def solve(self):
-        self.constraints(self.grid_expr)
+        return self.get_boxes(grid)
+
+    def solve(self, native=True):
+        # The native engine answers almost every grid in a few milliseconds,
+        # CP-SAT is only used when asked for or when the engine's search gets too big
+        if not self.consistent:
+            return None
+        if native:
+            try:
+                return self.engine.solve()
+            except SearchLimitReached:
+                pass
         solver = cp_model.CpSolver()
         status = solver.Solve(self.model)
         if status == cp_model.OPTIMAL:
@@ -59,12 +62,46 @@ class Sudoku(Puzzle):
         else:
             return None
 
+    @staticmethod
+    def solve_many(grids, box=3):
+        # Solves a batch of grids (each a list of rows or a flat list), returning one result per grid like solve().
+        # Singles propagation and search are run over the whole batch at once,
+        # only the few grids the batch search gives up on are searched one by one
+        n = box * box
+        values, status = solve_batch(grids, box)
+        results = []
+        for grid, state in zip(values.tolist(), status.tolist()):
+            if state == SOLVED:
+                results.append(grid)
+            elif state == OPEN:
+                try:
+                    results.append(SudokuEngine(grid, box).solve())
+                except SearchLimitReached:
+                    results.append(Sudoku([grid[i:i + n] for i in range(0, n * n, n)]).solve(native=False))
+            else:
+                results.append(None)
+        return results
+
+    @staticmethod
+    def generate(size=9, holes=None, seed=None, difficulty=None):
+        # Returns the rows of a random puzzle with a unique solution, with as many holes as possible when None.
+        # difficulty is one of sudoku_grader.LEVELS
+        box = isqrt(size)
+        assert box * box == size, f'Grid side {size} is not a square number'
+        generator = SudokuGenerator(box, seed)
+        if difficulty is None:
+            puzzle, _ = generator.puzzle(holes)
+        else:
+            puzzle = generator.graded_puzzle(difficulty, holes)
+        return [puzzle[i:i + size] for i in range(0, size * size, size)]
+
     def print(self):
         result = self.solve()
         if result:
             print("Solution found:")
-            for i in range(9):
-                row = [str(r) for r in result[9 * i: 9 * i + 9]]
+            width = len(str(self.n))
+            for i in range(self.n):
+                row = [str(r).rjust(width) for r in result[self.n * i: self.n * i + self.n]]
                 print(" ".join(row))
         else:
             print("No solution found")
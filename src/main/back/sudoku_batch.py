@@ -0,0 +1,131 @@
+import numpy as np
+from sudoku_engine import get_tables
+
+OPEN = 0  # propagation stopped before filling the grid, search is needed
+SOLVED = 1
+CONTRADICTION = -1
+
+_MATRICES = {}
+
+
+def get_matrices(box):
+    # Peer (cells x cells) and unit membership (units x cells) matrices, built once per box size
+    if box not in _MATRICES:
+        units, peers, _ = get_tables(box)
+        size = box ** 4
+        peer_matrix = np.zeros((size, size), dtype=np.float32)
+        for cell, cell_peers in enumerate(peers):
+            peer_matrix[cell, cell_peers] = 1
+        unit_matrix = np.zeros((len(units), size), dtype=np.float32)
+        for u, unit in enumerate(units):
+            unit_matrix[u, unit] = 1
+        _MATRICES[box] = (peer_matrix, unit_matrix)
+    return _MATRICES[box]
+
+
+def candidates(grids, box=3):
+    # (N, digits, cells) boolean candidate tensor of a batch of grids, 0 meaning an empty cell
+    n = box * box
+    grids = np.asarray(grids, dtype=np.int64).reshape(-1, n * n)
+    if grids.min(initial=0) < 0 or grids.max(initial=0) > n:
+        raise ValueError(f'Grid values must be between 0 and {n}')
+    digits = np.arange(1, n + 1)[None, :, None]
+    return (grids[:, None, :] == digits) | (grids[:, None, :] == 0)
+
+
+def propagate(cand, box=3):
+    """
+    Naked and hidden singles on a whole batch of candidate tensors at once, updating cand in place.
+    Candidates are held digit-major, as (N, digits, cells), so that every elimination step is a single
+    matrix product of the (N * digits, cells) view against the peer or unit matrix,
+    and the Python loop only runs once per propagation round.
+    Returns the status of every grid.
+    """
+    n = box * box
+    size = n * n
+    peer_matrix, unit_matrix = get_matrices(box)
+    status = np.full(cand.shape[0], OPEN, dtype=np.int8)
+    active = np.arange(cand.shape[0])
+    while active.size:
+        c = cand[active]
+        k = c.shape[0]
+        before = np.count_nonzero(c, axis=(1, 2))
+
+        # naked singles: a placed value disappears from every peer
+        placed = c & (c.sum(axis=1, dtype=np.uint8) == 1)[:, None, :]
+        seen = (placed.reshape(k * n, size).astype(np.float32) @ peer_matrix) > 0
+        c &= ~seen.reshape(k, n, size)
+
+        # hidden singles: a digit with a single place left in a unit goes there
+        in_units = c.reshape(k * n, size).astype(np.float32) @ unit_matrix.T
+        hidden = ((in_units == 1).astype(np.float32) @ unit_matrix) > 0
+        hidden = hidden.reshape(k, n, size) & c
+        pinned = hidden.sum(axis=1, dtype=np.uint8)
+        c &= hidden | (pinned != 1)[:, None, :]
+
+        # a cell without candidates, a digit without a place or two digits pinned to one cell
+        dead = (~c.any(axis=1)).any(axis=1) | (in_units == 0).reshape(k, -1).any(axis=1) | (pinned > 1).any(axis=1)
+        cand[active] = c
+        after = np.count_nonzero(c, axis=(1, 2))
+        stable = after == before
+        done = (after == size) & stable  # one extra round makes sure the filled grid has no clash
+        status[active[dead]] = CONTRADICTION
+        status[active[done & ~dead]] = SOLVED
+        active = active[~dead & ~stable]
+    return status
+
+
+def branch(cand):
+    # Splits every grid on its cell with the fewest candidates: first candidate placed / first candidate removed
+    n = cand.shape[1]
+    rows = np.arange(cand.shape[0])
+    counts = cand.sum(axis=1, dtype=np.uint8)
+    counts[counts <= 1] = n + 1
+    cell = counts.argmin(axis=1)
+    digit = cand[rows, :, cell].argmax(axis=1)
+    placed = cand.copy()
+    placed[rows, :, cell] = False
+    placed[rows, digit, cell] = True
+    removed = cand
+    removed[rows, digit, cell] = False
+    return np.concatenate([placed, removed])
+
+
+def solve_batch(grids, box=3, max_depth=24, max_states=None):
+    """
+    Solves a batch of grids with singles propagation, then a breadth-first search that is vectorized as well:
+    every open grid is split in two and the whole frontier is propagated again.
+    Grids whose frontier is still open after max_depth splits, or when the frontier exceeds max_states,
+    are left OPEN for the caller to search one by one.
+    Returns the (N, cells) array of values (the original grid when OPEN, zeros on CONTRADICTION)
+    and the status of every grid.
+    """
+    grids = np.asarray(grids, dtype=np.int64).reshape(-1, box ** 4)
+    count = grids.shape[0]
+    if max_states is None:
+        max_states = max(4 * count, 1024)
+    values = np.zeros_like(grids)
+    status = np.full(count, CONTRADICTION, dtype=np.int8)
+
+    cand = candidates(grids, box)
+    owner = np.arange(count)
+    for depth in range(max_depth + 1):
+        state = propagate(cand, box)
+        solved = owner[state == SOLVED]
+        # several branches of one grid may be solved at once, the first one wins
+        first = np.unique(solved, return_index=True)[1]
+        new = status[solved[first]] != SOLVED
+        values[solved[first][new]] = cand[state == SOLVED][first][new].argmax(axis=1) + 1
+        status[solved[first][new]] = SOLVED
+        keep = (state == OPEN) & (status[owner] != SOLVED)
+        cand, owner = cand[keep], owner[keep]
+        if not owner.size:
+            break
+        if depth == max_depth or 2 * owner.size > max_states:
+            status[owner] = OPEN
+            break
+        cand = branch(cand)
+        owner = np.concatenate([owner, owner])
+
+    values[status == OPEN] = grids[status == OPEN]
+    return values, status
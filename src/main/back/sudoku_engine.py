@@ -0,0 +1,222 @@
+from exact_cover import ExactCover, SearchLimitReached
+from latin_square import get_units
+
+_TABLES = {}
+
+
+def get_tables(box):
+    # Units (rows, columns, boxes), peers and units of every cell, computed once per box size
+    if box not in _TABLES:
+        n = box * box
+        rows, cols, boxes = get_units(n, box)
+        units = rows + cols + boxes
+        peers = []
+        cell_units = []
+        for cell in range(n * n):
+            r, c = cell // n, cell % n
+            b = (r // box) * box + c // box
+            peers.append(sorted(set(rows[r] + cols[c] + boxes[b]) - {cell}))
+            cell_units.append((r, n + c, 2 * n + b))  # indexes in units
+        _TABLES[box] = (units, peers, cell_units)
+    return _TABLES[box]
+
+
+class SudokuEngine:
+    """
+    Native Sudoku solver.
+    Every cell holds a bitmask of its candidates (bit d - 1 set if digit d is still possible).
+    Naked and hidden singles are propagated first, which is enough for most puzzles,
+    and whatever is left is solved as an exact cover problem (or by a plain depth-first search, for one solution).
+    """
+
+    NODE_LIMIT = 200000  # past this many search nodes, the caller should rather use CP-SAT
+
+    def __init__(self, grid, box=3, node_limit=NODE_LIMIT):
+        self.box = box
+        self.n = box * box
+        self.full = (1 << self.n) - 1
+        self.units, self.peers, self.cell_units = get_tables(box)
+        self.node_limit = node_limit
+        self.load(grid)
+
+    def load(self, grid):
+        # Starts again from the givens of grid, so that one engine serves many puzzles
+        size = self.n * self.n
+        self.cand = [self.full] * size
+        self.placed = [False] * size
+        self.queue = []
+        # False if the givens already contradict each other
+        self.consistent = True
+        # Digits used by the givens in every unit, the candidates of an empty cell are the digits its units lack
+        used = [0] * len(self.units)
+        for i, x in enumerate(grid):
+            if x != 0:
+                bit = 1 << (x - 1)
+                for u in self.cell_units[i]:
+                    if used[u] & bit:
+                        self.consistent = False
+                    used[u] |= bit
+                self.cand[i] = bit
+                self.placed[i] = True
+        for i, x in enumerate(grid):
+            if x == 0:
+                r, c, b = self.cell_units[i]
+                self.restrict(i, self.full & ~(used[r] | used[c] | used[b]))
+
+    def reset(self, cand, placed):
+        # Starts again from the given candidate masks and placed cells, so that one engine serves many searches
+        self.cand = list(cand)
+        self.placed = list(placed)
+        self.queue = [cell for cell, m in enumerate(self.cand) if not self.placed[cell] and m and not m & (m - 1)]
+        self.consistent = all(self.cand)
+
+    def restrict(self, cell, mask):
+        # Keeps only the candidates of mask for an open cell
+        m = self.cand[cell] & mask
+        self.cand[cell] = m
+        if not m:
+            self.consistent = False
+        elif not m & (m - 1):
+            self.queue.append(cell)
+
+    def exclude(self, cell, value):
+        # Forbids a value in an open cell
+        self.restrict(cell, ~(1 << (value - 1)))
+
+    def eliminate(self):
+        # Removes the value of every newly placed cell from its peers (naked singles)
+        cand, peers, placed, queue = self.cand, self.peers, self.placed, self.queue
+        while queue:
+            cell = queue.pop()
+            if placed[cell]:
+                continue
+            placed[cell] = True
+            bit = cand[cell]
+            for p in peers[cell]:
+                m = cand[p]
+                if m & bit:
+                    m &= ~bit
+                    if not m:
+                        queue.clear()
+                        return False
+                    cand[p] = m
+                    if not m & (m - 1):
+                        queue.append(p)
+        return True
+
+    def propagate(self):
+        # Naked and hidden singles until fixpoint, returns False on a contradiction
+        cand, queue, full = self.cand, self.queue, self.full
+        while True:
+            if not self.eliminate():
+                return False
+            for unit in self.units:
+                once = twice = 0
+                for cell in unit:
+                    m = cand[cell]
+                    twice |= once & m
+                    once |= m
+                if once != full:  # a digit has no place left in this unit
+                    return False
+                hidden = once & ~twice
+                if hidden:
+                    for cell in unit:
+                        m = cand[cell] & hidden
+                        if m and cand[cell] != m:
+                            if m & (m - 1):  # two digits can only go in this cell
+                                return False
+                            cand[cell] = m
+                            queue.append(cell)
+            if not queue:
+                return True
+
+    def candidates(self, cell):
+        # Values still possible for a cell
+        m = self.cand[cell]
+        return [d + 1 for d in range(self.n) if m >> d & 1]
+
+    def values(self, cand=None):
+        cand = self.cand if cand is None else cand
+        return [m.bit_length() for m in cand]
+
+    def exact_cover(self):
+        # Exact cover over the cells left open by propagation.
+        # Columns: cell filled, digit in row, digit in column, digit in box; rows: (cell, digit) pairs
+        n, box = self.n, self.box
+        size = n * n
+        rows = {}
+        for cell, m in enumerate(self.cand):
+            if self.placed[cell]:
+                continue
+            r, c = cell // n, cell % n
+            b = (r // box) * box + c // box
+            while m:
+                bit = m & -m
+                m ^= bit
+                d = bit.bit_length() - 1
+                rows[(cell, d)] = [cell, size + r * n + d, 2 * size + c * n + d, 3 * size + b * n + d]
+        return ExactCover(rows, node_limit=self.node_limit)
+
+    def solutions(self):
+        # Yields every solution as a flat list of values
+        if not self.consistent or not self.propagate():
+            return
+        if all(self.placed):
+            yield self.values()
+            return
+        for cover in self.exact_cover().search():
+            cand = list(self.cand)
+            for cell, d in cover:
+                cand[cell] = 1 << d
+            yield self.values(cand)
+
+    def first_solution(self):
+        # First solution of a depth-first search branching on the open cell with the fewest candidates, or None.
+        # Each branch works on a copy of the masks and the parent's are put back after it, which is cheaper than
+        # building an exact cover when a single solution is wanted.
+        # Raises SearchLimitReached past node_limit branches
+        self.nodes = 0
+        return self.branch()
+
+    def branch(self):
+        if not self.consistent or not self.propagate():
+            return None
+        cell, fewest = None, self.n + 1
+        for i, m in enumerate(self.cand):
+            if not self.placed[i] and m.bit_count() < fewest:
+                cell, fewest = i, m.bit_count()
+                if fewest == 2:
+                    break
+        if cell is None:
+            return self.values()
+        cand, placed = self.cand, self.placed
+        m = cand[cell]
+        while m:
+            bit = m & -m
+            m ^= bit
+            self.nodes += 1
+            if self.node_limit is not None and self.nodes > self.node_limit:
+                raise SearchLimitReached(f'Search exceeded {self.node_limit} nodes')
+            self.cand, self.placed, self.queue = list(cand), list(placed), [cell]
+            self.cand[cell] = bit
+            solution = self.branch()
+            if solution is not None:
+                return solution
+        self.cand, self.placed, self.queue = cand, placed, []
+        return None
+
+    def solve(self):
+        # Returns the first solution found, or None if the puzzle has none.
+        # Raises SearchLimitReached if the search gets too big
+        for solution in self.solutions():
+            return solution
+        return None
+
+    def count_solutions(self, limit=2):
+        # Counts solutions, stopping as soon as limit is reached
+        count = 0
+        for _ in self.solutions():
+            count += 1
+            if count >= limit:
+                break
+        return count
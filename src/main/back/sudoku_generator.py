@@ -0,0 +1,115 @@
+import random
+
+from exact_cover import SearchLimitReached
+from sudoku_engine import SudokuEngine, get_tables
+from sudoku_grader import LEVELS, SudokuGrader
+
+
+class SudokuGenerator:
+    """
+    Generates Sudoku puzzles with a unique solution.
+    A random full grid is dug one cell at a time, and a cell is only emptied if the puzzle stays unique.
+    Removing the value v of a cell keeps the puzzle unique exactly when no solution has something else than v
+    in that cell, so every dig step is a single search for a solution with v excluded, which stops at the first
+    solution found (the second solution of the puzzle) and is usually closed by propagation alone.
+    A cell that has to stay is never tried again, since removing more cells can only add solutions.
+    With a difficulty, a cell is also kept when emptying it would make the puzzle harder than asked.
+    """
+
+    ATTEMPTS = 50  # puzzles dug before settling for the closest difficulty
+
+    def __init__(self, box=3, seed=None):
+        self.box = box
+        self.n = box * box
+        self.size = self.n * self.n
+        self.full = (1 << self.n) - 1
+        self.units, self.peers, self.cell_units = get_tables(box)
+        self.random = random.Random(seed)
+        self.grader = SudokuGrader(box)
+        self.engine = SudokuEngine([0] * self.size, box)  # reset for every dig step instead of being rebuilt
+
+    def solution(self):
+        # A random full grid: the boxes on the diagonal do not constrain each other, so they are filled at random
+        # and the rest is completed by the engine, then the digits are relabelled at random
+        grid = [0] * self.size
+        for k in range(self.box):
+            cells = self.units[2 * self.n + k * self.box + k]
+            for cell, value in zip(cells, self.random.sample(range(1, self.n + 1), self.n)):
+                grid[cell] = value
+        solution = SudokuEngine(grid, self.box).solve()
+        digits = self.random.sample(range(1, self.n + 1), self.n)
+        return [digits[x - 1] for x in solution]
+
+    def is_single(self, used, cell, value):
+        # True if value is the only digit the units of the (emptied) cell leave for it
+        r, c, b = self.cell_units[cell]
+        return self.full & ~(used[r] | used[c] | used[b]) == 1 << (value - 1)
+
+    def update(self, cand, placed, used, cell):
+        # Candidate masks of cell and its open peers, after cell was dug or put back
+        for i in [cell] + self.peers[cell]:
+            if not placed[i]:
+                r, c, b = self.cell_units[i]
+                cand[i] = self.full & ~(used[r] | used[c] | used[b])
+
+    def is_forced(self, cand, placed, cell, value):
+        # True if no solution of the puzzle whose candidate masks (before propagation) are cand has something else
+        # than value in the (emptied) cell
+        self.engine.reset(cand, placed)
+        self.engine.exclude(cell, value)
+        try:
+            return self.engine.first_solution() is None
+        except SearchLimitReached:
+            return False  # not proved unique, keep the cell to be safe
+
+    def puzzle(self, holes=None, solution=None, max_level=None):
+        # Digs holes (as many as possible when None) in a full grid, returns (puzzle, solution) as flat lists.
+        # max_level is the index in LEVELS of the hardest grade the puzzle may have
+        if solution is None:
+            solution = self.solution()
+        grid = list(solution)
+        # Digits used in every unit and candidates of every cell, updated as cells are dug instead of being
+        # recomputed
+        used = [self.full] * len(self.units)
+        cand = [1 << (value - 1) for value in grid]
+        placed = [True] * self.size
+        dug = 0
+        for cell in self.random.sample(range(self.size), self.size):
+            if holes is not None and dug >= holes:
+                break
+            value = grid[cell]
+            bit = 1 << (value - 1)
+            grid[cell] = 0
+            placed[cell] = False
+            for u in self.cell_units[cell]:
+                used[u] &= ~bit
+            self.update(cand, placed, used, cell)
+            # a naked single is placed back by the very first step of any solver, so neither uniqueness nor grade
+            # can change; otherwise check uniqueness, then the grade
+            if self.is_single(used, cell, value) or (
+                    self.is_forced(cand, placed, cell, value) and
+                    (max_level is None or self.grader.level(grid, max_level) <= max_level)):
+                dug += 1
+            else:
+                grid[cell] = value
+                placed[cell] = True
+                cand[cell] = bit
+                for u in self.cell_units[cell]:
+                    used[u] |= bit
+                self.update(cand, placed, used, cell)
+        return grid, solution
+
+    def graded_puzzle(self, difficulty, holes=None):
+        # A puzzle whose grade is difficulty (one of LEVELS), or the hardest one below it found in ATTEMPTS tries
+        if difficulty not in LEVELS:
+            raise ValueError(f'Unknown difficulty {difficulty}, expected one of {", ".join(LEVELS)}')
+        target = LEVELS.index(difficulty)
+        best, best_level = None, -1
+        for _ in range(self.ATTEMPTS):
+            puzzle, _ = self.puzzle(holes, max_level=target)
+            level = self.grader.level(puzzle)
+            if level == target:
+                return puzzle
+            if level > best_level:
+                best, best_level = puzzle, level
+        return best
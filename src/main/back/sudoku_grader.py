@@ -0,0 +1,195 @@
+from itertools import combinations
+
+from sudoku_engine import SudokuEngine
+
+LEVELS = ['easy', 'medium', 'hard', 'expert', 'extreme']
+
+
+class Digits(dict):
+    # Digits (0-based) of every candidate mask, computed the first time a mask is met
+    def __missing__(self, m):
+        self[m] = digits = tuple(d for d in range(m.bit_length()) if m >> d & 1)
+        return digits
+
+
+class SudokuGrader:
+    """
+    Rates a puzzle by the hardest human technique needed to solve it.
+    Techniques are tried from the simplest up, and the search goes back to singles after every elimination,
+    so a harder technique is only used when nothing simpler makes progress.
+    Every technique works on the candidate bitmasks of SudokuEngine and is a handful of bitwise operations per
+    unit, which keeps grading cheap enough to run at every step of the generator. The positions of every digit in
+    every unit are computed once per round, into buffers kept from one puzzle to the next, and shared by the
+    techniques: they only lose candidates during a round, so positions from its start can only be too many, and
+    every technique stays sound on them.
+    A puzzle that these techniques cannot finish is rated 'extreme'.
+    """
+
+    def __init__(self, box=3):
+        self.box = box
+        self.n = box * box
+        self.engine = SudokuEngine([0] * self.n * self.n, box)  # loaded with every graded puzzle
+        # Positions of every digit in every unit (see positions)
+        self.places = [[0] * self.n for _ in self.engine.units]
+        # Masks of the positions k sharing k // box (a row inside a box, a box along a line) or k % box
+        # (a column inside a box)
+        group = (1 << box) - 1
+        self.segments = [group << (k // box * box) for k in range(self.n)]
+        self.columns = [sum(1 << (i * box + k % box) for i in range(box)) for k in range(self.n)]
+        self.digits = Digits()
+        # (name, index in LEVELS, function returning True if it removed candidates), from the simplest up
+        self.techniques = [
+            ('locked candidates', 1, self.locked_candidates),
+            ('naked pair', 2, lambda engine: self.naked_subset(engine, 2)),
+            ('hidden pair', 2, lambda engine: self.hidden_subset(engine, 2)),
+            ('naked triple', 2, lambda engine: self.naked_subset(engine, 3)),
+            ('hidden triple', 2, lambda engine: self.hidden_subset(engine, 3)),
+            ('x-wing', 2, lambda engine: self.fish(engine, 2)),
+            ('xy-wing', 3, self.xy_wing),
+            ('swordfish', 3, lambda engine: self.fish(engine, 3)),
+        ]
+
+    def grade(self, grid, limit=None):
+        # Returns (level, hardest technique used), or None if the puzzle has a contradiction.
+        # With limit (an index in LEVELS), the techniques above it are not tried, and a puzzle that needs one of
+        # them is rated 'extreme' right away
+        engine = self.engine
+        engine.load(grid)
+        if not engine.consistent or not engine.propagate():
+            return None
+        hardest = -1  # index in self.techniques, the list being sorted by difficulty
+        while not all(engine.placed):
+            for u, unit in enumerate(engine.units):
+                self.positions(engine, unit, self.places[u])
+            for i, (_, level, technique) in enumerate(self.techniques):
+                if limit is not None and level > limit:
+                    return LEVELS[-1], 'search'
+                if technique(engine):
+                    hardest = max(hardest, i)
+                    break
+            else:
+                return LEVELS[-1], 'search'
+            if not engine.consistent or not engine.propagate():
+                return None
+        if hardest < 0:
+            return LEVELS[0], 'singles'
+        name, level, _ = self.techniques[hardest]
+        return LEVELS[level], name
+
+    def level(self, grid, limit=None):
+        # Index of the puzzle's level in LEVELS, -1 if it has a contradiction (see grade for limit)
+        graded = self.grade(grid, limit)
+        return LEVELS.index(graded[0]) if graded else -1
+
+    @staticmethod
+    def remove(engine, cell, mask):
+        # Removes the digits of mask from a cell, returns True if anything changed
+        if engine.cand[cell] & mask:
+            engine.restrict(cell, ~mask)
+            return True
+        return False
+
+    def positions(self, engine, unit, places):
+        # Fills places with the bitmask of the positions (indexes in the unit) still open to each digit,
+        # 0 for digits already placed
+        cand, placed, digits = engine.cand, engine.placed, self.digits
+        for d in range(self.n):
+            places[d] = 0
+        done = 0
+        for k, cell in enumerate(unit):
+            if placed[cell]:
+                done |= cand[cell]
+                continue
+            for d in digits[cand[cell]]:
+                places[d] |= 1 << k
+        for d in digits[done]:
+            places[d] = 0
+
+    def locked_candidates(self, engine):
+        # Pointing: a digit confined to one row or column inside a box leaves the rest of that row or column.
+        # Claiming: a digit confined to one box inside a row or column leaves the rest of that box
+        units, cell_units, n = engine.units, engine.cell_units, self.n
+        segments, columns = self.segments, self.columns
+        changed = False
+        for u, unit in enumerate(units):
+            for d, places in enumerate(self.places[u]):
+                if places & (places - 1) == 0:
+                    continue  # placed or a hidden single
+                k = (places & -places).bit_length() - 1
+                first = unit[k]
+                # inside a box, positions k = i * box + j: one row is i constant, one column is j constant;
+                # along a line, one box is k // box constant
+                for kind, group in (((0, segments[k]), (1, columns[k])) if u >= 2 * n else ((2, segments[k]),)):
+                    if places & ~group == 0:
+                        for cell in units[cell_units[first][kind]]:
+                            if cell_units[cell][u // n] != u:
+                                changed |= self.remove(engine, cell, 1 << d)
+        return changed
+
+    def naked_subset(self, engine, size):
+        # size open cells of a unit sharing exactly size candidates: those digits leave the rest of the unit
+        cand, placed = engine.cand, engine.placed
+        changed = False
+        for unit in engine.units:
+            open_cells = [cell for cell in unit if not placed[cell] and cand[cell].bit_count() <= size]
+            for subset in combinations(open_cells, size):
+                union = 0
+                for cell in subset:
+                    union |= cand[cell]
+                if union.bit_count() == size:
+                    for cell in unit:
+                        if cell not in subset and not placed[cell]:
+                            changed |= self.remove(engine, cell, union)
+        return changed
+
+    def hidden_subset(self, engine, size):
+        # size digits of a unit confined to the same size cells: those cells lose every other digit
+        changed = False
+        for unit, places in zip(engine.units, self.places):
+            digits = [d for d in range(self.n) if 2 <= places[d].bit_count() <= size]
+            for subset in combinations(digits, size):
+                union = 0
+                for d in subset:
+                    union |= places[d]
+                if union.bit_count() == size:
+                    keep = sum(1 << d for d in subset)
+                    for k, cell in enumerate(unit):
+                        if union >> k & 1:
+                            changed |= self.remove(engine, cell, ~keep & engine.full)
+        return changed
+
+    def fish(self, engine, size):
+        # X-wing (2) and swordfish (3): a digit confined to the same size columns in size rows
+        # leaves those columns everywhere else, and the same with rows and columns swapped
+        n = self.n
+        changed = False
+        for places, cover in ((self.places[:n], engine.units[n:2 * n]), (self.places[n:2 * n], engine.units[:n])):
+            for d in range(n):
+                lines = [i for i in range(n) if 2 <= places[i][d].bit_count() <= size]
+                for chosen in combinations(lines, size):
+                    union = 0
+                    for i in chosen:
+                        union |= places[i][d]
+                    if union.bit_count() == size:
+                        for k in range(n):
+                            if union >> k & 1:
+                                for i, cell in enumerate(cover[k]):
+                                    if i not in chosen:
+                                        changed |= self.remove(engine, cell, 1 << d)
+        return changed
+
+    def xy_wing(self, engine):
+        # A pivot {a, b} seeing two pincers {a, c} and {b, c}: one of them is c, so c leaves every cell seeing both
+        cand, peers = engine.cand, engine.peers
+        changed = False
+        bivalue = {cell for cell, m in enumerate(cand) if not engine.placed[cell] and m.bit_count() == 2}
+        for pivot in bivalue:
+            m = cand[pivot]
+            wings = [cell for cell in peers[pivot] if cell in bivalue and (cand[cell] & m).bit_count() == 1]
+            for x, y in combinations(wings, 2):
+                c = cand[x] & cand[y]
+                if cand[x] & m != cand[y] & m and c.bit_count() == 1 and not c & m:
+                    for cell in set(peers[x]).intersection(peers[y]):
+                        if cell != pivot and not engine.placed[cell]:
+                            changed |= self.remove(engine, cell, c)
+        return changed
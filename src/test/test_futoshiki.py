@@ -0,0 +1,87 @@
+import pytest
+from ortools.sat.python import cp_model
+from src.main.back.futoshiki import Futoshiki
+from src.main.back.futoshiki_generator import get_generator
+
+ineqs = [[">", 0, 1], [">", 2, 3], [">", 3, 4], ["<", 18, 19], ["<", 20, 21], ["<", 21, 22]]
+rows = [
+    [0, 0, 0, 0, 0],
+    [4, 0, 0, 0, 2],
+    [0, 0, 4, 0, 0],
+    [0, 0, 0, 0, 4],
+    [0, 0, 0, 0, 0]
+]
+
+
+def test_futoshiki_rows():
+    futoshiki = Futoshiki(rows, ineqs)
+    assert rows == futoshiki.get_rows(futoshiki.grid)
+    assert len(futoshiki.grid_expr) == 25
+
+
+def test_futoshiki_solve():
+    futoshiki = Futoshiki(rows, ineqs)
+    sol = futoshiki.solve()
+    assert sol is not None
+    for line in futoshiki.get_rows(sol) + futoshiki.get_cols(sol):
+        assert sorted(line) == [1, 2, 3, 4, 5]
+    for op, a, b in ineqs:
+        assert sol[a] < sol[b] if op == '<' else sol[a] > sol[b]
+    for i, x in enumerate(futoshiki.grid):
+        assert x == 0 or sol[i] == x
+
+
+def test_futoshiki_bounds():
+    bounds = Futoshiki(rows, ineqs).bounds()
+    assert bounds[2] == (3, 5)  # 2 > 3 > 4
+    assert bounds[3] == (2, 4)
+    assert bounds[4] == (1, 3)
+    assert bounds[20] == (1, 3)  # 20 < 21 < 22
+    assert bounds[22] == (3, 5)
+    assert bounds[5] == (4, 4)  # given
+    assert bounds[6] == (1, 5)  # unconstrained
+
+
+def test_futoshiki_contradictions():
+    cycle = [["<", 0, 1], ["<", 1, 6], ["<", 6, 0]]
+    futoshiki = Futoshiki(rows, cycle)
+    assert futoshiki.bounds() is None
+    assert futoshiki.solve() is None
+    too_long = [["<", i, i + 1] for i in range(4)] + [["<", 4, 9]]  # a chain of 6 cells in a 5x5 grid
+    assert Futoshiki(rows, too_long).solve() is None
+    against_given = [["<", 5, 6], ["<", 6, 7]]  # 4 < x < y in a 5x5 grid
+    assert Futoshiki(rows, against_given).solve() is None
+    assert Futoshiki(rows, against_given, tighten=False).solve() is None
+
+
+def test_incomplete_futoshiki():
+    with pytest.raises(AssertionError):
+        Futoshiki(rows[:2], ineqs)
+
+
+def test_generate_unique():
+    generator = get_generator(5)
+    for seed in range(5):
+        puzzle_rows, puzzle_ineqs = generator.puzzle(seed)
+        futoshiki = Futoshiki(puzzle_rows, puzzle_ineqs)
+        sol = futoshiki.solve()
+        assert sol is not None
+        for op, a, b in puzzle_ineqs:
+            assert b in (a + 1, a + 5)
+        # no second solution
+        other = Futoshiki(puzzle_rows, puzzle_ineqs)
+        other.constraints(other.grid_expr)
+        differs = [other.model.new_bool_var(f'd[{i}]') for i in range(25)]
+        for x, v, d in zip(other.grid_expr, sol, differs):
+            other.model.Add(x != v).OnlyEnforceIf(d)
+        other.model.AddBoolOr(differs)
+        solver = cp_model.CpSolver()
+        assert solver.Solve(other.model) == cp_model.INFEASIBLE
+
+
+def test_generator_reuses_model():
+    generator = get_generator(5)
+    constraints = len(generator.model.Proto().constraints)
+    generator.puzzle(0)
+    assert len(generator.model.Proto().constraints) == constraints
+    assert get_generator(5) is generator
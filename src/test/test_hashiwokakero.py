@@ -0,0 +1,112 @@
+import pytest
+from src.main.back.hashiwokakero import CONNECTIVITY, Hashiwokakero
+
+puzzle = [
+    [4, 0, 3, 0, 3, 0, 3],
+    [0, 2, 0, 0, 0, 4, 0],
+    [3, 0, 0, 3, 0, 0, 3],
+    [0, 0, 0, 0, 0, 0, 0],
+    [2, 0, 0, 8, 0, 4, 0],
+    [0, 0, 0, 0, 1, 0, 3],
+    [0, 1, 0, 4, 0, 1, 0],
+]
+
+crossing_puzzle = [
+    [0, 1, 0, 0],
+    [1, 0, 0, 1],
+    [0, 0, 0, 0],
+    [0, 1, 0, 0],
+]
+
+
+split_puzzle = [
+    [1, 0, 1],
+    [0, 0, 0],
+    [1, 0, 1],
+]
+
+
+def bridges(hashiwokakero):
+    return {(node.index, neighbor.index) for node in hashiwokakero.nodes for neighbor in node.neighbors
+            if node.index < neighbor.index}
+
+
+def cross(n, horizontal, vertical):
+    (a, b), (c, d) = horizontal, vertical
+    return a // n == b // n and c % n == d % n and a % n < c % n < b % n and c // n < a // n < d // n
+
+
+@pytest.mark.parametrize('connectivity', CONNECTIVITY)
+def test_hashiwokakero_solve(connectivity):
+    hashiwokakero = Hashiwokakero(puzzle)
+    sol = hashiwokakero.solve(connectivity)
+    assert sol is not None
+    for index, info in sol.items():
+        assert sum(info['edges'].values()) == info['value']
+        for neighbor, edge in info['edges'].items():
+            assert sol[neighbor]['edges'][index] == edge
+    # no two drawn bridges cross
+    for horizontal, vertical in hashiwokakero.crossings():
+        assert sol[horizontal[0]]['edges'][horizontal[1]] == 0 or sol[vertical[0]]['edges'][vertical[1]] == 0
+    # the drawn bridges join all the islands
+    stack, seen = [hashiwokakero.nodes[0].index], {hashiwokakero.nodes[0].index}
+    while stack:
+        for neighbor, edge in sol[stack.pop()]['edges'].items():
+            if edge and neighbor not in seen:
+                seen.add(neighbor)
+                stack.append(neighbor)
+    assert seen == set(sol)
+
+
+@pytest.mark.parametrize('connectivity', CONNECTIVITY)
+def test_hashiwokakero_split(connectivity):
+    # two pairs of 1s match every value, but always apart
+    assert Hashiwokakero(split_puzzle, deduce=False).solve(connectivity) is None
+
+
+def test_crossings():
+    for rows in (puzzle, crossing_puzzle):
+        hashiwokakero = Hashiwokakero(rows)
+        n = hashiwokakero.n
+        candidates = bridges(hashiwokakero)
+        crossings = hashiwokakero.crossings()
+        assert len(crossings) == len(set(crossings))
+        # same pairs as comparing every horizontal bridge with every vertical one
+        assert set(crossings) == {(h, v) for h in candidates for v in candidates if cross(n, h, v)}
+    assert Hashiwokakero(crossing_puzzle).crossings() == [((4, 7), (1, 13))]
+    # the two bridges cannot be both drawn
+    assert Hashiwokakero(crossing_puzzle).solve() is None
+
+
+def test_neighbors():
+    hashiwokakero = Hashiwokakero(puzzle)
+    n = hashiwokakero.n
+    for node in hashiwokakero.nodes:
+        # walking out from the island, the first island met in each direction
+        expected = []
+        r, c = divmod(node.index, n)
+        for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            k = 1
+            while 0 <= r + k * dr < n and 0 <= c + k * dc < n:
+                if puzzle[r + k * dr][c + k * dc]:
+                    expected.append((r + k * dr) * n + c + k * dc)
+                    break
+                k += 1
+        assert [neighbor.index for neighbor in node.neighbors] == expected
+
+
+def test_deduction():
+    hashiwokakero = Hashiwokakero(puzzle)
+    assert 0 < hashiwokakero.resolved <= 1
+    # the 8 takes two bridges on all four sides
+    for neighbor in (17, 45, 28, 33):
+        assert hashiwokakero.bounds[min(31, neighbor), max(31, neighbor)] == [2, 2]
+    sol = hashiwokakero.solve()
+    assert sol is not None
+    for (a, b), (low, high) in hashiwokakero.bounds.items():
+        assert low <= sol[a]['edges'][b] <= high
+    # an island asking more bridges than its neighbours can hold
+    assert not Hashiwokakero([[3, 0, 1], [0, 0, 0], [0, 0, 0]]).consistent
+    # two 1s joined together would be cut off from the other islands
+    assert not Hashiwokakero(crossing_puzzle).consistent
+    assert Hashiwokakero([[1, 0, 1], [0, 0, 0], [0, 0, 0]]).bounds == {(0, 2): [1, 1]}
@@ -0,0 +1,53 @@
+import pytest
+from src.main.back.hashiwokakero import Hashiwokakero
+from src.main.back.hashiwokakero_generator import HashiwokakeroGenerator
+
+
+def test_tree():
+    generator = HashiwokakeroGenerator(10, seed=1)
+    grid, bridges = generator.tree()
+    islands = [idx for idx in range(100) if grid[idx]]
+    assert len(bridges) == len(islands) - 1
+    # every bridge joins facing islands, and the bridges reach every island without crossing
+    hashiwokakero = Hashiwokakero(generator.rows(grid), deduce=False)
+    assert set(bridges) <= set(hashiwokakero.bounds)
+    assert not any(horizontal in bridges and vertical in bridges for horizontal, vertical in hashiwokakero.crossings())
+    reached = {islands[0]}
+    for _ in islands:
+        reached |= {idx for pair in bridges if reached & set(pair) for idx in pair}
+    assert reached == set(islands)
+    for idx in islands:
+        assert grid[idx] == sum(count for pair, count in bridges.items() if idx in pair)
+
+
+def test_generated_puzzle_unique():
+    generator = HashiwokakeroGenerator(7, seed=2)
+    for rows, solution in generator.puzzles(3):
+        for connectivity in ('reach', 'lazy'):
+            assert Hashiwokakero(rows).solve(connectivity) == solution
+
+
+def test_too_small():
+    # a 3x3 board holds one island by default, and no 2x2 board fits three
+    for n, islands in ((3, None), (2, 3), (5, 2)):
+        with pytest.raises(ValueError):
+            HashiwokakeroGenerator(n, islands=islands)
+    generator = HashiwokakeroGenerator(4, seed=3)
+    generator.ATTEMPTS = 0
+    with pytest.raises(RuntimeError):
+        generator.puzzle()
+    generator.ATTEMPTS = HashiwokakeroGenerator.ATTEMPTS
+    rows, solution = generator.puzzle()
+    assert Hashiwokakero(rows).solve() == solution
+
+
+def test_other_solution():
+    # four 3s in a square take a double bridge on two opposite sides, either pair of them
+    generator = HashiwokakeroGenerator(3, islands=4)
+    rows = [[3, 0, 3], [0, 0, 0], [3, 0, 3]]
+    bridges = {(0, 2): 2, (6, 8): 2, (0, 6): 1, (2, 8): 1}
+    assert generator.other_solution(rows, bridges) == {(0, 2): 1, (6, 8): 1, (0, 6): 2, (2, 8): 2}
+    # a single bridge doubled rules the other one out
+    grid = sum(rows, [])
+    assert generator.repair(grid, bridges, {(0, 2): 1, (6, 8): 1, (0, 6): 2, (2, 8): 2})
+    assert generator.other_solution(generator.rows(grid), bridges) is None
@@ -0,0 +1,24 @@
+from src.main.back.latin_square import get_skeleton, get_units
+from src.main.back.futoshiki import Futoshiki
+from src.main.back.sudoku import Sudoku
+
+
+def test_units():
+    rows, cols, boxes = get_units(4, 2)
+    assert rows[1] == (4, 5, 6, 7)
+    assert cols[2] == (2, 6, 10, 14)
+    assert boxes[3] == (10, 11, 14, 15)
+    assert get_units(4, 2) is get_units(4, 2)
+    assert get_units(5) == (get_units(5)[0], get_units(5)[1], ())
+
+
+def test_shared_model_untouched():
+    skeleton = get_skeleton(4, 2)
+    constraints = len(skeleton.Proto().constraints)
+    sudoku = Sudoku([[1, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
+    assert len(sudoku.model.Proto().constraints) == constraints == 12
+    assert list(sudoku.model.Proto().variables[0].domain) == [1, 1]
+    assert list(skeleton.Proto().variables[0].domain) == [1, 4]
+    futoshiki = Futoshiki([[0] * 4 for _ in range(4)], [['<', 0, 1]])
+    futoshiki.solve()
+    assert len(get_skeleton(4).Proto().constraints) == 8
@@ -0,0 +1,153 @@
+import pytest
+from src.main.back.numberlink import FORMULATIONS, Numberlink
+from src.main.back.numberlink_router import NumberlinkRouter
+
+puzzle = [
+    [0, 0, 0, 0, 3, 2, 1],
+    [0, 0, 0, 0, 1, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 0, 2, 0, 0, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0],
+    [0, 3, 5, 0, 0, 4, 0],
+    [4, 0, 0, 0, 0, 0, 5],
+]
+
+wrong_puzzle = [
+    [1, 2, 0],
+    [0, 0, 0],
+    [0, 2, 1],
+]
+
+# Boards on which the formulations disagree, with the solution of each: 'reach' lets the 2 branch round the first
+# one, 'edges' lets the 1 run next to its endpoints through the whole second one
+different_puzzles = [
+    ([[0, 0, 2], [0, 0, 1], [2, 1, 0]], {'reach': [0, 0, 0, 0, 0, 1, 0, 1, 1], 'edges': None}),
+    ([[1, 0, 0], [0, 0, 0], [0, 0, 1]], {'reach': None, 'edges': [0] * 9}),
+]
+
+
+def check_paths(numberlink, sol):
+    # Every cell is on a path, and the cells of a path are connected and hold both its endpoints
+    assert len(sol) == numberlink.n * numberlink.n
+    assert set(sol) == {path.index for path in numberlink.paths}
+    for path in numberlink.paths:
+        cells = {idx for idx in range(len(sol)) if sol[idx] == path.index}
+        assert path.end in cells
+        stack, seen = [path.start], {path.start}
+        while stack:
+            for neighbor in numberlink.get_neighbors(stack.pop()):
+                if neighbor in cells and neighbor not in seen:
+                    seen.add(neighbor)
+                    stack.append(neighbor)
+        assert seen == cells
+
+
+@pytest.mark.parametrize('formulation', FORMULATIONS)
+def test_numberlink_solve(formulation):
+    numberlink = Numberlink(puzzle)
+    sol = numberlink.solve(formulation, native=False)
+    assert sol is not None
+    check_paths(numberlink, sol)
+    for rows, solutions in different_puzzles:
+        for propagate in (False, True):
+            assert Numberlink(rows, propagate).solve(formulation) == solutions[formulation]
+
+
+@pytest.mark.parametrize('formulation', FORMULATIONS)
+def test_numberlink_wrong_puzzle(formulation):
+    assert Numberlink(wrong_puzzle).solve(formulation, native=False) is None
+
+
+@pytest.mark.parametrize('formulation', FORMULATIONS)
+def test_numberlink_unpaired(formulation):
+    # a number that appears once, or three times, has no path
+    for rows in ([[1, 0, 0], [0, 2, 0], [0, 0, 1]], [[1, 0, 1], [0, 0, 0], [1, 0, 0]]):
+        numberlink = Numberlink(rows)
+        assert not numberlink.consistent
+        assert numberlink.solve(formulation, native=False) is None
+
+
+def test_edge_model_size():
+    # the edge formulation does not grow with the number of colours
+    reach, edges = Numberlink(puzzle), Numberlink(puzzle)
+    reach.constraints()
+    edges.edge_constraints()
+    assert len(edges.model.Proto().variables) < len(reach.model.Proto().variables) // 4
+
+
+def test_propagation():
+    numberlink = Numberlink(puzzle)
+    assert 0 < numberlink.resolved < 1
+    # the top left corner only has two neighbours, the 3 at the top only one that is not another endpoint
+    assert {(0, 1), (0, 7), (3, 4)} <= numberlink.links
+    for formulation in FORMULATIONS:
+        propagated = Numberlink(puzzle).solve(formulation, native=False)
+        check_paths(numberlink, propagated)
+        for a, b in numberlink.links:
+            assert propagated[a] == propagated[b]
+    # forced moves alone solve this one
+    forced = [
+        [0, 0, 5, 4],
+        [5, 1, 4, 0],
+        [1, 0, 3, 0],
+        [2, 0, 2, 3],
+    ]
+    numberlink = Numberlink(forced)
+    assert numberlink.resolved == 1
+    assert numberlink.colours == Numberlink(forced, propagate=False).solve(native=False)
+
+
+def test_propagation_dead_end():
+    # the top right corner can only be reached from the 2 and the 1 next to it, which are different paths
+    dead_end = [
+        [0, 1, 0],
+        [2, 0, 0],
+        [1, 2, 0],
+    ]
+    numberlink = Numberlink(dead_end)
+    assert not numberlink.consistent and numberlink.resolved is None
+    for formulation in FORMULATIONS:
+        assert numberlink.solve(formulation, native=False) is None
+        assert Numberlink(dead_end, propagate=False).solve(formulation, native=False) is None
+
+
+def test_propagation_only_for_edges():
+    # the 2 has to branch round the board: the reach formulation allows it, propagation and edges do not
+    branching = [
+        [0, 0, 2],
+        [0, 0, 1],
+        [2, 1, 0],
+    ]
+    for propagate in (False, True):
+        assert Numberlink(branching, propagate).solve('reach', native=False) == [0, 0, 0, 0, 0, 1, 0, 1, 1]
+        assert Numberlink(branching, propagate).solve('edges', native=False) is None
+
+
+def test_router():
+    numberlink = Numberlink(puzzle)
+    router = NumberlinkRouter(numberlink.n, [(path.start, path.end) for path in numberlink.paths])
+    sol = router.route(5)
+    assert sol is not None
+    check_paths(numberlink, sol)
+    # the native router answers first, with the same labelling as the CP-SAT model
+    check_paths(numberlink, numberlink.solve('edges', native=True))
+
+
+def test_router_not_for_reach():
+    # one path through the whole board: the router and the edge model find it, the reach model does not
+    # (an endpoint next to two cells of its path), and solve('reach') does not ask the router
+    corners = [
+        [1, 0, 0],
+        [0, 0, 0],
+        [0, 0, 1],
+    ]
+    assert Numberlink(corners).solve('edges', native=True) == [0] * 9
+    assert Numberlink(corners).solve('reach', native=True) is None
+    assert Numberlink(corners).solve() is None
+
+
+def test_router_gives_up():
+    # the 2 can only go straight down the middle, which cuts the ends of the 1 apart: no solution
+    numberlink = Numberlink(wrong_puzzle, propagate=False)
+    router = NumberlinkRouter(numberlink.n, [(path.start, path.end) for path in numberlink.paths])
+    assert router.route(0.1) is None
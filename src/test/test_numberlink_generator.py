@@ -0,0 +1,33 @@
+from src.main.back.numberlink import Numberlink
+from src.main.back.numberlink_generator import NumberlinkGenerator
+
+
+def test_hamiltonian_path():
+    generator = NumberlinkGenerator(8, seed=1)
+    path = generator.hamiltonian_path()
+    assert sorted(path) == list(range(64))
+    for a, b in zip(path, path[1:]):
+        assert b in generator.neighbors[a]
+    segments = generator.split(path)
+    assert sum(segments, []) == path
+    assert all(len(segment) >= 3 for segment in segments)
+
+
+def test_generated_puzzle_unique():
+    generator = NumberlinkGenerator(7, seed=2)
+    for rows, solution in generator.puzzles(3):
+        numberlink = Numberlink(rows)
+        assert len(numberlink.paths) == max(map(max, rows))
+        assert numberlink.solve('edges', native=False) == solution
+
+
+def test_other_solution():
+    # a single path from corner to corner can snake through the board by rows or by columns
+    generator = NumberlinkGenerator(3)
+    snake = [[0, 1, 2, 5, 4, 3, 6, 7, 8]]
+    rows, _ = generator.board(snake)
+    other = generator.other_solution(rows, snake)
+    assert other == [0] * 9
+    assert not generator.unique(snake)
+    # cut in three, it only has one solution
+    assert generator.unique([[0, 1, 2], [5, 4, 3], [6, 7, 8]])
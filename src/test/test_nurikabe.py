@@ -1,5 +1,5 @@
 import pytest
-from src.main.back.nurikabe import Nurikabe
+from src.main.back.nurikabe import LAND, SEA, Nurikabe
 
 puzzle = [
         [0, 0, 5, 0, 0],
@@ -132,3 +132,60 @@ def test_incomplete_nurikabe():
 def test_nurikabe_wrong_puzzle():
     assert Nurikabe(wrong_puzzle).solve() is None
     assert Nurikabe(wrong_puzzle2).solve() is None
+
+
+def test_island_reach():
+    nuri = Nurikabe(puzzle)
+    five, three, one, other_three = [island.index for island in nuri.islands]
+    assert nuri.reachable[one] == {20: 0}
+    # the 5 in the top row cannot step next to the 3 below its right neighbour, so it goes around to the left
+    assert 3 not in nuri.reachable[five] and 7 not in nuri.reachable[five]
+    assert nuri.reachable[five][12] == 4
+    for island in nuri.islands:
+        for idx, distance in nuri.reachable[island.index].items():
+            r, c = idx // nuri.n, idx % nuri.n
+            assert abs(r - island.pos // nuri.n) + abs(c - island.pos % nuri.n) <= distance < island.value
+
+
+def test_unreachable_cells_are_sea():
+    nuri = Nurikabe(big_puzzle)
+    reached = {idx for cells in nuri.reachable.values() for idx in cells}
+    sol = nuri.solve()
+    for idx in range(len(sol)):
+        if idx not in reached:
+            assert sol[idx] == 0
+
+
+def test_nurikabe_lazy_strategy():
+    for rows in rows_list:
+        nuri = Nurikabe(rows, 'lazy')
+        sol = nuri.solve()
+        assert sol is not None
+        for island in nuri.islands:
+            assert dfs(island.pos, sol, island.index, island.value, nuri.n)
+        sea = [i for i in range(len(sol)) if sol[i] == 0]
+        assert dfs(sea[0], sol, 0, len(sea), nuri.n)
+        for i in range(len(sol)):
+            assert nuri.grid[i] == 0 or sol[i] != 0
+    assert Nurikabe(wrong_puzzle, 'lazy').solve() is None
+    assert Nurikabe(wrong_puzzle2, 'lazy').solve() is None
+
+
+def test_deduction():
+    for rows in rows_list:
+        nuri = Nurikabe(rows)
+        assert 0 < nuri.resolved <= 1
+        sol = Nurikabe(rows, deduce=False).solve()
+        assert nuri.solve() == sol
+        # every decided cell agrees with the solution
+        for idx, state in enumerate(nuri.known):
+            if state == SEA:
+                assert sol[idx] == 0
+            elif state == LAND:
+                assert sol[idx] != 0
+            elif state is not None:
+                assert sol[idx] == state
+    # two adjacent clues cannot be kept apart by the sea
+    nuri = Nurikabe(wrong_puzzle)
+    assert not nuri.consistent and nuri.resolved is None
+    assert nuri.solve() is None
@@ -0,0 +1,21 @@
+from src.main.back.nurikabe import Nurikabe
+from src.main.back.nurikabe_generator import NurikabeGenerator
+
+
+def test_grown_sea():
+    generator = NurikabeGenerator(8, seed=2)
+    sea = generator.grow(40)
+    assert len(sea) <= 40
+    for idx in sea:
+        assert not generator.closes_pool(sea - {idx}, idx)
+    # the sea is a single island of the board where the islands are the sea
+    assert len(generator.islands(set(range(64)) - sea)) == 1
+
+
+def test_generated_puzzle_unique():
+    generator = NurikabeGenerator(6, seed=1)
+    for rows, solution in generator.puzzles(3):
+        sea = {idx for idx in range(36) if solution[idx] == 0}
+        assert generator.other_solution(rows, sea) is None
+        assert Nurikabe(rows).solve() == solution
+        assert Nurikabe(rows, 'lazy').solve() == solution
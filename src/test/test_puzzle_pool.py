@@ -0,0 +1,60 @@
+import itertools
+import threading
+
+import pytest
+from src.main.back.puzzle_pool import PuzzlePool
+
+
+class CountingGenerator:
+    def __init__(self):
+        self.counter = itertools.count()
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, puzzle, size, difficulty=None):
+        if puzzle == "invalid":
+            raise Exception("Invalid puzzle type")
+        with self.lock:
+            self.calls.append(threading.current_thread().name)
+        return [puzzle, size, difficulty, next(self.counter)]
+
+
+@pytest.fixture
+def pool():
+    pool = PuzzlePool(CountingGenerator(), capacity=6, low_water=3, workers=1)
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_on_demand_then_refilled(pool):
+    first = pool.get("sudoku", 9, "easy")  # empty pool: generated in the request
+    assert first[:3] == ["sudoku", 9, "easy"]
+    assert pool.generator.calls[0] == threading.current_thread().name
+    pool.shutdown()  # waits for the background refill
+    assert pool.size("sudoku", 9, "easy") == pool.capacity
+    assert all(name.startswith('puzzle-pool') for name in pool.generator.calls[1:])
+
+
+def test_pool_pops_ready_puzzles(pool):
+    pool.warm([("sudoku", 9, None)])
+    pool.shutdown()
+    calls = len(pool.generator.calls)
+    seen = [pool.get("sudoku", 9)[3] for _ in range(pool.capacity - pool.low_water)]
+    assert len(set(seen)) == len(seen)  # every puzzle is handed out once
+    assert len(pool.generator.calls) == calls  # nothing generated while above the low-water mark
+
+
+def test_pool_invalid_key(pool):
+    with pytest.raises(Exception):
+        pool.get("invalid", 9)
+    assert pool.size("invalid", 9) == 0
+
+
+def test_pool_evicts_least_recent_key():
+    pool = PuzzlePool(CountingGenerator(), capacity=2, low_water=1, workers=1, max_pools=2)
+    pool.warm([("sudoku", 9, None), ("sudoku", 4, None)])
+    pool.get("sudoku", 9)  # asked for more recently than 4x4
+    pool.get("nurikabe", 7)
+    pool.shutdown()
+    assert set(pool.pools) == {("sudoku", 9, None), ("nurikabe", 7, None)}
+    assert pool.size("sudoku", 4) == 0
@@ -1,5 +1,8 @@
+import multiprocessing
+
 import pytest
-from src.main.back.shikaku import Shikaku
+from src.main.back import shikaku as shikaku_module
+from src.main.back.shikaku import METHODS, Shikaku
 
 rows_1 = [
     [0, 2, 2, 0, 0],
@@ -88,3 +91,86 @@ def test_wrong_shikaku():
         [0, 0, 0, 4, 0]
     ]
     assert Shikaku(wrong_puzzle).solve() is None
+
+
+def test_shikaku_methods_agree():
+    for rows in rows_list:
+        solutions = [Shikaku(rows, method).solve() for method in METHODS]
+        assert all(sol is not None for sol in solutions)
+        # the three boards have a unique solution
+        assert solutions[0] == solutions[1]
+
+
+def test_shikaku_placements():
+    shikaku = Shikaku(rows_1)
+    placements = shikaku.placements()
+    assert len(placements) == len(shikaku.rectangles)
+    # the 3 in the middle of the board can only lie flat or stand, and never over another clue
+    three = [rect.index for rect in shikaku.rectangles if rect.pos == 12][0]
+    for top, left, bottom, right in placements[three]:
+        assert (bottom - top + 1) * (right - left + 1) == 3
+        assert top <= 2 <= bottom and left <= 2 <= right
+
+
+def test_wrong_shikaku_bounds():
+    wrong_puzzle = [
+        [2, 2, 2, 0, 0],
+        [0, 4, 2, 0, 2],
+        [0, 0, 3, 0, 0],
+        [0, 0, 4, 0, 2],
+        [0, 0, 0, 4, 0]
+    ]
+    assert Shikaku(wrong_puzzle, 'bounds').solve() is None
+
+
+def test_shikaku_propagate():
+    shikaku = Shikaku(rows_1)
+    placements = shikaku.placements()
+    fixed = shikaku.propagate(placements)
+    # this board is solved by forced placements alone
+    assert len(fixed) == len(shikaku.rectangles)
+    assert shikaku.regions(placements, fixed) == []
+    # the 7 rectangles of this one only leave one region after the forced one
+    shikaku = Shikaku(rows_3)
+    placements = shikaku.placements()
+    fixed = shikaku.propagate(placements)
+    assert len(fixed) == 1
+    assert len(shikaku.regions(placements, fixed)) == 1
+
+
+regions_rows = [
+    [4, 0, 0, 4],
+    [0, 0, 0, 0],
+    [0, 0, 0, 0],
+    [0, 4, 4, 0]
+]
+
+
+def solve_regions(rows):
+    # run in a daemonic process, which may not start the process pool
+    shikaku = Shikaku(rows)
+    shikaku.PARALLEL_CELLS = 0
+    return shikaku_module.get_executor(), shikaku.solve()[1]
+
+
+def test_shikaku_regions():
+    # two halves that do not interact, each with two solutions
+    shikaku = Shikaku(regions_rows)
+    placements = shikaku.placements()
+    fixed = shikaku.propagate(placements)
+    regions = shikaku.regions(placements, fixed)
+    assert fixed == {}
+    assert sorted(cells for _, cells in regions) == [[0, 1, 4, 5, 8, 9, 12, 13], [2, 3, 6, 7, 10, 11, 14, 15]]
+    shikaku.PARALLEL_CELLS = 0  # through the process pool
+    result, rectangles = shikaku.solve()
+    assert sorted(rectangles) == [0, 1, 2, 3]
+    for rect in rectangles.values():
+        assert (rect['bottom'] - rect['top'] + 1) * (rect['right'] - rect['left'] + 1) == 4
+    assert sorted(result.count(i) for i in range(4)) == [4, 4, 4, 4]
+
+
+def test_shikaku_regions_in_daemon():
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        executor, rectangles = pool.apply(solve_regions, (regions_rows,))
+    assert executor is None  # the regions were solved one after the other
+    assert sorted(rectangles) == [0, 1, 2, 3]
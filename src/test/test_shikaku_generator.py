@@ -0,0 +1,22 @@
+from src.main.back.shikaku import Shikaku
+from src.main.back.shikaku_generator import ShikakuGenerator
+
+
+def test_partition_covers_board():
+    generator = ShikakuGenerator(12, seed=1)
+    covered = [0] * 144
+    for cell_list in map(generator.cells, generator.partition()):
+        for cell in cell_list:
+            covered[cell] += 1
+    assert covered == [1] * 144
+
+
+def test_generated_puzzle_unique():
+    generator = ShikakuGenerator(10, seed=3)
+    for _ in range(3):
+        rows, rectangles = generator.puzzle()
+        shikaku = Shikaku(rows)
+        assert len(shikaku.rectangles) == len(rectangles)
+        assert shikaku.count_solutions() == 1
+        _, solved = shikaku.solve()
+        assert sorted((r['top'], r['left'], r['bottom'], r['right']) for r in solved.values()) == sorted(rectangles)
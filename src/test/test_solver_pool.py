@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+
+import pytest
+from src.main.back import shikaku
+from src.main.back.solver_pool import PoolFull, SolverPool
+
+
+def work(task, seconds=0):
+    # solver run in the workers: sleeps, then returns the worker's pid or fails
+    time.sleep(seconds)
+    if task == "invalid":
+        raise ValueError("Invalid puzzle type")
+    return os.getpid()
+
+
+def solve_shikaku(rows):
+    # solver run in the workers: a board whose regions go to Shikaku's own process pool
+    board = shikaku.Shikaku(rows)
+    board.PARALLEL_CELLS = 0
+    result, _ = board.solve()
+    return result, shikaku.get_executor() is not None
+
+
+@pytest.fixture
+def pool():
+    pool = SolverPool(work, workers=1, max_queue=0, timeout=5, max_jobs=3)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_solves_in_a_worker(pool):
+    pid = pool.solve("sudoku")
+    assert pid != os.getpid()
+    assert pool.solve("sudoku") == pid
+    with pytest.raises(ValueError, match="Invalid puzzle type"):
+        pool.solve("invalid")
+
+
+def test_pool_recycles_workers(pool):
+    pids = [pool.solve("sudoku") for _ in range(2 * pool.max_jobs)]
+    assert pids == [pids[0]] * pool.max_jobs + [pids[-1]] * pool.max_jobs
+    assert pids[0] != pids[-1]
+
+
+def test_pool_timeout_kills_the_worker(pool):
+    pid = pool.solve("sudoku")
+    with pytest.raises(TimeoutError):
+        pool.solve("sudoku", 10, timeout=0.5)
+    assert pool.solve("sudoku") != pid  # a fresh worker took over
+
+
+def test_pool_full(pool):
+    running = threading.Thread(target=pool.solve, args=("sudoku", 1))
+    running.start()
+    time.sleep(0.2)
+    with pytest.raises(PoolFull):
+        pool.solve("sudoku")
+    running.join()
+    pool.solve("sudoku")
+
+
+def test_pool_runs_shikaku_regions():
+    # two halves that do not interact, solved in the process pool of the worker
+    pool = SolverPool(solve_shikaku, workers=1, max_queue=0, timeout=30)
+    try:
+        result, parallel = pool.solve([[4, 0, 0, 4], [0, 0, 0, 0], [0, 0, 0, 0], [0, 4, 4, 0]])
+    finally:
+        pool.terminate()
+    assert parallel
+    assert sorted(result.count(i) for i in range(4)) == [4, 4, 4, 4]
+    assert not pool.live
@@ -1,5 +1,7 @@
 import pytest
 from src.main.back.sudoku import Sudoku
+from src.main.back.sudoku_engine import SudokuEngine
+from src.main.back.sudoku_grader import SudokuGrader
 
 rows = [
     [0, 0, 0, 0, 0, 0, 0, 0, 0],
@@ -124,3 +126,149 @@ def test_completed_sudoku():  # Tests if a completed sudoku puzzle is accepted (
         [6, 9, 5, 4, 1, 7, 3, 8, 2]
     ]
     assert Sudoku(completed_puzzle).solve() is not None
+
+
+def test_native_matches_cp_sat():
+    hard_puzzle = [  # Needs search after singles propagation
+        [8, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 3, 6, 0, 0, 0, 0, 0],
+        [0, 7, 0, 0, 9, 0, 2, 0, 0],
+        [0, 5, 0, 0, 0, 7, 0, 0, 0],
+        [0, 0, 0, 0, 4, 5, 7, 0, 0],
+        [0, 0, 0, 1, 0, 0, 0, 3, 0],
+        [0, 0, 1, 0, 0, 0, 0, 6, 8],
+        [0, 0, 8, 5, 0, 0, 0, 1, 0],
+        [0, 9, 0, 0, 0, 0, 4, 0, 0]
+    ]
+    for puzzle in [rows, hard_puzzle]:
+        native = Sudoku(puzzle).solve()
+        assert native is not None
+        assert native == Sudoku(puzzle).solve(native=False)  # both puzzles have a unique solution
+        for i in range(81):
+            if puzzle[i // 9][i % 9] != 0:
+                assert native[i] == puzzle[i // 9][i % 9]
+
+
+def test_native_wrong_sudoku():
+    rows = [[0] * 9 for _ in range(9)]
+    rows[0] = [1, 2, 3, 4, 5, 6, 7, 8, 0]
+    rows[4][8] = 9  # No duplicate, but the last cell of the first row has no value left
+    assert Sudoku(rows).solve() is None
+    assert Sudoku(rows).solve(native=False) is None
+
+
+def test_solve_many(sudoku):
+    completed_puzzle = [
+        [4, 8, 3, 9, 2, 1, 6, 5, 7],
+        [9, 6, 7, 3, 4, 5, 8, 2, 1],
+        [2, 5, 1, 8, 7, 6, 4, 9, 3],
+        [5, 4, 8, 1, 3, 2, 9, 7, 6],
+        [7, 2, 9, 5, 6, 4, 1, 3, 8],
+        [1, 3, 6, 7, 9, 8, 2, 4, 5],
+        [3, 7, 2, 6, 8, 9, 5, 1, 4],
+        [8, 1, 4, 2, 5, 3, 7, 6, 9],
+        [6, 9, 5, 4, 1, 7, 3, 8, 2]
+    ]
+    easy_puzzle = [[x if (i + j) % 3 else 0 for j, x in enumerate(row)] for i, row in enumerate(completed_puzzle)]
+    wrong_puzzle = [row[:] for row in completed_puzzle]
+    wrong_puzzle[8][8] = 1  # Duplicate '1'
+    blank_puzzle = [[0] * 9 for _ in range(9)]
+    puzzles = [rows, completed_puzzle, easy_puzzle, wrong_puzzle, blank_puzzle]
+    results = Sudoku.solve_many(puzzles)
+    assert len(results) == len(puzzles)
+    assert results[0] == sudoku.solve()
+    assert results[1] == [x for row in completed_puzzle for x in row]
+    assert results[2] == results[1]
+    assert results[3] is None
+    assert results[4] is not None
+    assert Sudoku(sudoku.get_rows(results[4])).solve() == results[4]  # a filled grid is its own solution
+
+
+def test_sudoku_16x16():
+    box, n = 4, 16
+    solution = [[(box * (r % box) + r // box + c) % n + 1 for c in range(n)] for r in range(n)]
+    puzzle = [[x if (3 * r + c) % 5 else 0 for c, x in enumerate(row)] for r, row in enumerate(solution)]
+    sudoku = Sudoku(puzzle)
+    assert sudoku.box == box
+    assert len(sudoku.get_squares(sudoku.grid)) == n
+    for propagate in [True, False]:
+        for native in [True, False]:
+            sol = Sudoku(puzzle, propagate).solve(native)
+            assert sol is not None
+            for line in sudoku.get_rows(sol) + sudoku.get_cols(sol) + sudoku.get_squares(sol):
+                assert sorted(line) == list(range(1, n + 1))
+            for i in range(n * n):
+                assert sudoku.grid[i] in (0, sol[i])
+
+
+def test_sudoku_reduced_domains(sudoku):
+    # Propagation before the model is built narrows down the domains without losing the solution
+    sol = sudoku.solve()
+    for i, x in enumerate(sudoku.grid_expr):
+        domain = x.proto.domain
+        assert domain[0] <= sol[i] <= domain[-1]
+    blank = Sudoku([[0] * 9 for _ in range(9)])
+    assert all(list(x.proto.domain) == [1, 9] for x in blank.grid_expr)
+
+
+def test_sudoku_not_square():
+    with pytest.raises(AssertionError):
+        Sudoku([[0] * 5 for _ in range(5)])
+
+
+def test_sudoku_generate():
+    for seed in range(5):
+        puzzle = Sudoku.generate(seed=seed)
+        assert len(puzzle) == 9 and all(len(row) == 9 for row in puzzle)
+        grid = [x for row in puzzle for x in row]
+        assert SudokuEngine(grid).count_solutions(limit=2) == 1
+        # as many holes as possible: no given can be removed without losing uniqueness
+        for i in range(81):
+            if grid[i] != 0:
+                dug = grid[:i] + [0] + grid[i + 1:]
+                assert SudokuEngine(dug).count_solutions(limit=2) == 2
+    puzzle = Sudoku.generate(holes=30, seed=0)
+    assert sum(x == 0 for row in puzzle for x in row) == 30
+    assert Sudoku.generate(holes=30, seed=0) == puzzle
+
+
+def test_engine_first_solution():
+    grid = [x for row in rows for x in row]
+    engine = SudokuEngine(grid)
+    cand, placed = list(engine.cand), list(engine.placed)
+    solution = engine.first_solution()
+    assert solution == SudokuEngine(grid).solve()
+    # reset goes back to the masks before the search, which excluding the solution's digit leaves unsolvable
+    engine.reset(cand, placed)
+    engine.exclude(0, solution[0])
+    assert engine.first_solution() is None
+    engine.reset(cand, placed)
+    assert engine.first_solution() == solution
+
+
+def to_grid(line):
+    return [int(c) for c in line]
+
+
+def test_sudoku_grader():
+    grader = SudokuGrader()
+    assert grader.grade(to_grid("530070000600195000098000060800060003400803001700020006060000280000419005000080079")) == \
+        ('easy', 'singles')
+    assert grader.grade(to_grid("100000569492056108056109240009640801064010000218035604040500016905061402621000005")) == \
+        ('hard', 'x-wing')
+    assert grader.grade(to_grid("016007803090800000870001260048000300650009082039000650060900020080002936924600510")) == \
+        ('expert', 'xy-wing')
+    assert grader.grade(to_grid("100007090030020008009600500005300900010080002600004000300000010040000007007000300")) == \
+        ('extreme', 'search')
+    assert grader.grade(to_grid("1" * 2 + "0" * 79)) is None
+
+
+def test_sudoku_generate_difficulty():
+    grader = SudokuGrader()
+    for difficulty in ['easy', 'medium']:
+        puzzle = Sudoku.generate(seed=1, difficulty=difficulty)
+        grid = [x for row in puzzle for x in row]
+        assert grader.grade(grid)[0] == difficulty
+        assert SudokuEngine(grid).count_solutions(limit=2) == 1
+    with pytest.raises(ValueError):
+        Sudoku.generate(difficulty='impossible')